@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core import checks
+from django.core.cache import cache
+
+USER_KEY = 'core:user:{}'
+CACHED_SESSION_ENGINES = (
+    'django.contrib.sessions.backends.cache',
+    'django.contrib.sessions.backends.cached_db',
+)
+# кэши, которые у каждого процесса свои
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend, который держит пользователя сессии в кэше
+    AUTH_USER_CACHE_TIMEOUT секунд. Запись сбрасывается при сохранении
+    пользователя (смена пароля, last_login), удалении и выходе.
+    """
+
+    def get_user(self, user_id):
+        key = USER_KEY.format(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+        return user
+
+
+def forget_user(user_id):
+    cache.delete(USER_KEY.format(user_id))
+
+
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Сессии и пользователь в кэше допустимы только с общим для процессов
+    кэшем: иначе выход и смена пароля сбрасывают их лишь в одном процессе.
+    """
+    uses_cache = (
+        settings.SESSION_ENGINE in CACHED_SESSION_ENGINES
+        or 'core.auth.CachedModelBackend' in settings.AUTHENTICATION_BACKENDS
+    )
+    backends = {settings.CACHES[alias]['BACKEND']
+                for alias in ('default', settings.SESSION_CACHE_ALIAS)}
+    if uses_cache and backends & set(LOCAL_CACHE_BACKENDS):
+        return [checks.Error(
+            'Сессии или пользователь сессии хранятся в кэше процесса.',
+            hint='Включите общий кэш (memcached, redis, файловый) или '
+                 'уберите YATUBE_CACHED_SESSIONS.',
+            id='core.E001',
+        )]
+    return []
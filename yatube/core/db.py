@@ -0,0 +1,111 @@
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+PIN_COOKIE = 'primary_pin'
+
+_state = ContextVar('db_routing', default=None)
+
+
+class RoutingState:
+    """Что известно о базах в текущем запросе."""
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+class PrimaryReplicaRouter:
+    """
+    Пишет всё в default, а модели приложений DATABASE_REPLICA_APPS
+    читает с реплик DATABASE_REPLICAS. После записи чтение в том же
+    запросе и у того же клиента идёт с основной базы.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if (not replicas or model._meta.app_label
+                not in settings.DATABASE_REPLICA_APPS):
+            return 'default'
+        state = _state.get()
+        if state is not None and (state.pinned or state.wrote):
+            return 'default'
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # реплики - копии default, связи между ними допустимы
+        databases = {'default', *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+@contextmanager
+def primary_reads():
+    """Чтение внутри блока идёт только с основной базы."""
+    outer = _state.get()
+    state = RoutingState(pinned=True)
+    token = _state.set(state)
+    try:
+        yield
+    finally:
+        _state.reset(token)
+        if outer is not None and state.wrote:
+            outer.wrote = True
+
+
+def use_primary(view):
+    """Представление читает только с основной базы: формы правки."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        with primary_reads():
+            return view(*args, **kwargs)
+    return wrapper
+
+
+class PrimaryPinMiddleware:
+    """
+    Read-your-writes: после записи клиент получает cookie и следующие
+    DATABASE_PIN_SECONDS секунд читает с основной базы.
+    """
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def _is_pinned(self, request):
+        try:
+            return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
+
+    def __call__(self, request):
+        state = RoutingState(pinned=self._is_pinned(request))
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        if state.wrote:
+            seconds = settings.DATABASE_PIN_SECONDS
+            response.set_cookie(PIN_COOKIE, str(time.time() + seconds),
+                                max_age=seconds, httponly=True,
+                                samesite='Lax')
+        return response
@@ -0,0 +1,62 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+
+from .models import QueuedEmail
+from .queue import claim, postpone
+
+# пауза перед первым повтором, дальше она растёт вдвое
+RETRY_DELAY = timedelta(minutes=1)
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    """
+    Кладёт письма в таблицу QueuedEmail и сразу возвращает управление.
+    Отправляет их команда send_queued_mail через EMAIL_QUEUE_BACKEND.
+    """
+
+    def send_messages(self, email_messages):
+        queued = [QueuedEmail.from_message(message)
+                  for message in email_messages if message.recipients()]
+        QueuedEmail.objects.bulk_create(queued)
+        return len(queued)
+
+
+def _postpone(queued, error, max_attempts):
+    postpone(queued, error, max_attempts, 'next_attempt_at', RETRY_DELAY)
+
+
+def send_queued(batch_size=100, max_attempts=5):
+    """
+    Отправляет одну пачку писем, которым пора уходить, через одно
+    соединение. Возвращает пару (отправлено, не отправлено).
+    Несколько обработчиков не получат одно и то же письмо.
+    """
+    # письма забираются коротким UPDATE, а отправка идёт вне транзакции:
+    # пока работает SMTP, запись в базу не блокируется
+    batch = claim(QueuedEmail.objects.all(), 'next_attempt_at', batch_size)
+    if not batch:
+        return 0, 0
+    mail = get_connection(settings.EMAIL_QUEUE_BACKEND)
+    try:
+        mail.open()
+    except Exception as error:
+        # сервер недоступен: вся пачка уходит на повтор
+        for queued in batch:
+            _postpone(queued, error, max_attempts)
+        return 0, len(batch)
+    delivered = []
+    try:
+        for queued in batch:
+            try:
+                mail.send_messages([queued.message])
+            except Exception as error:
+                _postpone(queued, error, max_attempts)
+            else:
+                delivered.append(queued.pk)
+    finally:
+        mail.close()
+    QueuedEmail.objects.filter(pk__in=delivered).delete()
+    return len(delivered), len(batch) - len(delivered)
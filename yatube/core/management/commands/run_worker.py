@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.tasks import run_due
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет отложенные задачи из очереди Task в пуле потоков; '
+        'упавшие задачи повторяются с растущей паузой.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--once', action='store_true',
+                            help='Разобрать очередь и завершиться.')
+        parser.add_argument('--interval', type=float, default=1,
+                            help='Пауза между проверками очереди, секунды.')
+
+    def handle(self, *args, **options):
+        while True:
+            done, errors = run_due(options['batch_size'], options['threads'])
+            if done or errors:
+                self.stdout.write(
+                    f'Выполнено: {done}, отложено: {errors}')
+            if done + errors < options['batch_size']:
+                # очередь разобрана: ждём новых задач
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
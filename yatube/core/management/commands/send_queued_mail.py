@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.mail import send_queued
+
+
+class Command(BaseCommand):
+    help = (
+        'Отправляет письма из очереди QueuedEmail пачками, по одному '
+        'соединению на пачку; неудачные откладываются на повтор.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--max-attempts', type=int, default=5,
+                            help='После стольких неудач письмо не шлётся.')
+        parser.add_argument('--loop', action='store_true',
+                            help='Не завершаться, а ждать новых писем.')
+        parser.add_argument('--interval', type=float, default=5,
+                            help='Пауза между проверками очереди, секунды.')
+
+    def handle(self, *args, **options):
+        while True:
+            sent, errors = send_queued(options['batch_size'],
+                                       options['max_attempts'])
+            if sent or errors:
+                self.stdout.write(
+                    f'Отправлено: {sent}, отложено: {errors}')
+            if errors or sent < options['batch_size']:
+                # очередь разобрана или сервер сбоит: ждём
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
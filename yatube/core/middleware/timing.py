@@ -0,0 +1,156 @@
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends import django as django_backend
+
+logger = logging.getLogger('yatube.timing')
+
+_current = ContextVar('request_timings', default=None)
+
+
+class Timings:
+    """Замеры одного запроса."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.queries = 0
+        self.db = 0.0
+        self.render = 0.0
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db += time.perf_counter() - started
+
+
+class TimingStats:
+    """Скользящее окно последних замеров по каждому view."""
+
+    def __init__(self, window):
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+
+    def record(self, view, sample):
+        with self._lock:
+            self._samples[view].append(sample)
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+    def summary(self):
+        with self._lock:
+            samples = {view: list(items)
+                       for view, items in self._samples.items()}
+        return {view: _summarize(items) for view, items in samples.items()}
+
+
+def _percentile(ordered, share):
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+
+def _summarize(samples):
+    summary = {'count': len(samples)}
+    for metric in ('total', 'view', 'db', 'render', 'queries'):
+        ordered = sorted(sample[metric] for sample in samples)
+        summary[metric] = {
+            'mean': round(sum(ordered) / len(ordered), 3),
+            'p50': _percentile(ordered, 0.5),
+            'p90': _percentile(ordered, 0.9),
+            'p99': _percentile(ordered, 0.99),
+        }
+    return summary
+
+
+stats = TimingStats(getattr(settings, 'REQUEST_TIMING_WINDOW', 1000))
+
+
+def _timed_render(render):
+    @wraps(render)
+    def wrapper(self, *args, **kwargs):
+        timings = _current.get()
+        if timings is None:
+            return render(self, *args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            timings.render += time.perf_counter() - started
+    wrapper.timed = True
+    return wrapper
+
+
+def instrument_templates():
+    """Оборачивает render шаблонов Django; повторный вызов ничего не делает."""
+    template = django_backend.Template
+    if not getattr(template.render, 'timed', False):
+        template.render = _timed_render(template.render)
+
+
+class RequestTimingMiddleware:
+    """
+    Считает SQL-запросы, время БД, шаблонов и view для каждого запроса,
+    отдаёт их в заголовке Server-Timing, пишет в лог yatube.timing и в
+    скользящую статистику. При REQUEST_TIMING_ENABLED = False Django
+    исключает middleware из цепочки целиком.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_TIMING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        instrument_templates()
+
+    def __call__(self, request):
+        timings = Timings()
+        token = _current.set(timings)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(timings.record_query))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - timings.started
+        view = (time.perf_counter() - timings.view_started
+                if timings.view_started else 0.0)
+        sample = {
+            'total': round(total * 1000, 3),
+            'view': round(view * 1000, 3),
+            'db': round(timings.db * 1000, 3),
+            'render': round(timings.render * 1000, 3),
+            'queries': timings.queries,
+        }
+        response['Server-Timing'] = ', '.join((
+            f'total;dur={sample["total"]}',
+            f'view;dur={sample["view"]}',
+            f'db;dur={sample["db"]};desc="{timings.queries} queries"',
+            f'render;dur={sample["render"]}',
+        ))
+        match = request.resolver_match
+        view_name = match.view_name if match else 'unresolved'
+        stats.record(view_name, sample)
+        logger.info(json.dumps({
+            'view': view_name, 'path': request.path,
+            'status': response.status_code, **sample,
+        }))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = _current.get()
+        if timings is not None:
+            timings.view_started = time.perf_counter()
@@ -0,0 +1,55 @@
+import copy
+import pickle
+
+from django.db import models
+from django.utils import timezone
+
+
+class QueuedEmail(models.Model):
+    """Письмо, ждущее отправки командой send_queued_mail."""
+    payload = models.BinaryField()
+    created = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    failed = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = (
+            models.Index(fields=('failed', 'next_attempt_at'),
+                         name='core_queuedemail_due_idx'),
+        )
+
+    @classmethod
+    def from_message(cls, message):
+        # соединение не сериализуется и при отправке всё равно заменяется
+        message = copy.copy(message)
+        message.connection = None
+        return cls(payload=pickle.dumps(message))
+
+    @property
+    def message(self):
+        return pickle.loads(self.payload)
+
+    def __str__(self):
+        return self.message.subject
+
+
+class Task(models.Model):
+    """Отложенный вызов функции с @task, его выполняет run_worker."""
+    name = models.CharField(max_length=200)
+    payload = models.TextField()
+    created = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    failed = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = (
+            models.Index(fields=('failed', 'run_at'),
+                         name='core_task_due_idx'),
+        )
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,37 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+# столько взятая запись скрыта от других обработчиков
+LEASE = timedelta(minutes=5)
+
+
+def claim(queryset, due_field, batch_size, lease=LEASE):
+    """
+    Забирает до batch_size записей очереди, которым пора выполняться.
+    Срок каждой сдвигается на lease условным UPDATE, поэтому запись
+    достаётся одному обработчику, а блокировка базы держится только на
+    время этого UPDATE. Записи в очереди - с полями attempts, last_error
+    и failed; due_field - поле со сроком.
+    """
+    now = timezone.now()
+    due = list(queryset.filter(
+        failed=False, **{f'{due_field}__lte': now}
+    ).order_by(due_field, 'pk').values_list('pk', due_field)[:batch_size])
+    claimed = []
+    for pk, due_at in due:
+        if queryset.filter(pk=pk, **{due_field: due_at}).update(
+                **{due_field: now + lease}):
+            claimed.append(pk)
+    return list(queryset.filter(pk__in=claimed).order_by('pk'))
+
+
+def postpone(queued, error, max_attempts, due_field, retry_delay):
+    """Откладывает запись: пауза растёт вдвое после каждой неудачи."""
+    queued.attempts += 1
+    queued.last_error = f'{type(error).__name__}: {error}'
+    queued.failed = queued.attempts >= max_attempts
+    setattr(queued, due_field, timezone.now() + (
+        retry_delay * 2 ** (queued.attempts - 1)))
+    queued.save(update_fields=('attempts', 'last_error', 'failed',
+                               due_field))
@@ -0,0 +1,86 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import update_wrapper
+
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
+
+from .models import Task
+from .queue import claim, postpone
+
+# пауза перед первым повтором, дальше она растёт вдвое
+RETRY_DELAY = timedelta(seconds=30)
+MAX_ATTEMPTS = 5
+
+
+class TaskFunction:
+    """Функция, которую можно вызвать сразу или отложить через delay()."""
+
+    def __init__(self, func, max_attempts):
+        update_wrapper(self, func)
+        self.func = func
+        self.name = f'{func.__module__}.{func.__qualname__}'
+        self.max_attempts = max_attempts
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        """
+        Ставит вызов в очередь Task; аргументы должны сохраняться в JSON.
+        Запись в очередь идёт в той же транзакции, что и вызвавший её
+        код. При TASKS_EAGER функция выполняется сразу.
+        """
+        if settings.TASKS_EAGER:
+            self.func(*args, **kwargs)
+            return None
+        return Task.objects.create(
+            name=self.name,
+            payload=json.dumps({'args': args, 'kwargs': kwargs}),
+        )
+
+
+def task(func=None, *, max_attempts=MAX_ATTEMPTS):
+    """Декоратор отложенной задачи: @task или @task(max_attempts=3)."""
+    if func is None:
+        return lambda func: TaskFunction(func, max_attempts)
+    return TaskFunction(func, max_attempts)
+
+
+def run_task(queued):
+    """Выполняет задачу: удачная удаляется, неудачная откладывается."""
+    max_attempts = MAX_ATTEMPTS
+    try:
+        func = import_string(queued.name)
+        max_attempts = getattr(func, 'max_attempts', max_attempts)
+        payload = json.loads(queued.payload)
+        func(*payload['args'], **payload['kwargs'])
+    except Exception as error:
+        postpone(queued, error, max_attempts, 'run_at', RETRY_DELAY)
+        return False
+    queued.delete()
+    return True
+
+
+def _run_in_thread(queued):
+    try:
+        return run_task(queued)
+    finally:
+        connection.close()
+
+
+def run_due(batch_size=100, threads=1):
+    """
+    Выполняет одну пачку задач, которым пора выполняться, в threads
+    потоках. Возвращает пару (выполнено, отложено).
+    """
+    batch = claim(Task.objects.all(), 'run_at', batch_size)
+    if threads > 1 and len(batch) > 1:
+        with ThreadPoolExecutor(threads) as pool:
+            results = list(pool.map(_run_in_thread, batch))
+    else:
+        results = [run_task(queued) for queued in batch]
+    done = sum(results)
+    return done, len(results) - done
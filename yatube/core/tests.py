@@ -0,0 +1,378 @@
+import os
+import tempfile
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.auth import USER_KEY, check_shared_cache
+from core.db import (PIN_COOKIE, PrimaryPinMiddleware, PrimaryReplicaRouter,
+                     use_primary)
+from core.middleware.timing import RequestTimingMiddleware, stats
+from core.mail import send_queued
+from core.models import QueuedEmail, Task
+from core.queue import claim
+from core.tasks import task
+from posts import caching, search
+from posts import tasks as posts_tasks
+from posts.models import Group, Post
+
+User = get_user_model()
+
+calls = []
+
+
+@task
+def record(value, label=''):
+    calls.append((value, label))
+
+
+@task(max_attempts=2)
+def explode():
+    raise RuntimeError('сбой задачи')
+
+
+class RequestTimingMiddlewareTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        stats.clear()
+
+    def test_server_timing_header(self):
+        """Ответ содержит Server-Timing с БД, шаблонами и view."""
+        response = self.client.get(reverse('posts:index'))
+        header = response['Server-Timing']
+        for metric in ('total;dur=', 'view;dur=', 'db;dur=', 'render;dur='):
+            with self.subTest(metric=metric):
+                self.assertIn(metric, header)
+        self.assertIn('queries"', header)
+
+    def test_stats_endpoint_is_staff_only(self):
+        """Статистику видит только staff, и в ней есть замеры view."""
+        self.client.get(reverse('posts:index'))
+        url = reverse('timing_stats')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        self.client.force_login(staff)
+        summary = self.client.get(url).json()
+        self.assertEqual(summary['posts:index']['count'], 1)
+        self.assertGreaterEqual(
+            summary['posts:index']['queries']['p50'], 1)
+
+    @override_settings(REQUEST_TIMING_ENABLED=False)
+    def test_disabled_middleware_is_skipped(self):
+        """Выключенная middleware не попадает в цепочку обработки."""
+        with self.assertRaises(MiddlewareNotUsed):
+            RequestTimingMiddleware(lambda request: None)
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise ConnectionError('сервер недоступен')
+
+
+@override_settings(
+    EMAIL_BACKEND='core.mail.QueuedEmailBackend',
+    EMAIL_QUEUE_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+)
+class QueuedEmailTest(TestCase):
+    def setUp(self):
+        User.objects.create_user(username='mailer', email='mailer@mail.ru',
+                                 password='mailer_pass')
+
+    def reset_password(self):
+        self.client.post(reverse('password_reset'),
+                         {'email': 'mailer@mail.ru'})
+
+    def test_batch_claimed_once(self):
+        """Письма пачки не достаются второму обработчику."""
+        self.reset_password()
+        queued = QueuedEmail.objects.all()
+        self.assertEqual(len(claim(queued, 'next_attempt_at', 10)), 1)
+        self.assertEqual(claim(queued, 'next_attempt_at', 10), [])
+        self.assertEqual(send_queued(), (0, 0))
+
+    def test_request_only_queues_mail(self):
+        """Сброс пароля ставит письмо в очередь, а не отправляет его."""
+        self.reset_password()
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(QueuedEmail.objects.count(), 1)
+
+    def test_worker_sends_queue(self):
+        """Команда отправляет письма из очереди и удаляет их."""
+        self.reset_password()
+        self.reset_password()
+        call_command('send_queued_mail', batch_size=1, stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(mail.outbox[0].to, ['mailer@mail.ru'])
+        self.assertFalse(QueuedEmail.objects.exists())
+
+    @override_settings(EMAIL_QUEUE_BACKEND='core.tests.FailingEmailBackend')
+    def test_failed_mail_is_retried(self):
+        """Неудачное письмо откладывается, а после лимита попыток - нет."""
+        self.reset_password()
+        call_command('send_queued_mail', max_attempts=2, stdout=StringIO())
+        queued = QueuedEmail.objects.get()
+        self.assertEqual(queued.attempts, 1)
+        self.assertFalse(queued.failed)
+        self.assertGreater(queued.next_attempt_at, timezone.now())
+        self.assertIn('сервер недоступен', queued.last_error)
+        QueuedEmail.objects.update(next_attempt_at=timezone.now())
+        call_command('send_queued_mail', max_attempts=2, stdout=StringIO())
+        self.assertTrue(QueuedEmail.objects.get().failed)
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1', 'replica_2'])
+class PrimaryReplicaRouterTest(TestCase):
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+
+    def request(self, write=False, cookies=None):
+        """Прогоняет запрос через middleware, возвращает базы и ответ."""
+        databases = []
+
+        def view(request):
+            if write:
+                self.router.db_for_write(Post)
+            databases.append(self.router.db_for_read(Post))
+            return HttpResponse()
+
+        request = RequestFactory().get('/')
+        request.COOKIES.update(cookies or {})
+        response = PrimaryPinMiddleware(view)(request)
+        return databases[0], response
+
+    def test_reads_go_to_replicas(self):
+        """Посты читаются с реплик, пользователи и запись - с default."""
+        self.assertIn(self.router.db_for_read(Post),
+                      ('replica_1', 'replica_2'))
+        self.assertEqual(self.router.db_for_read(User), 'default')
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+        self.assertIs(self.router.allow_migrate('replica_1', 'posts'),
+                      False)
+
+    def test_write_pins_client_to_primary(self):
+        """После записи клиент какое-то время читает с default."""
+        database, response = self.request()
+        self.assertNotEqual(database, 'default')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+        database, response = self.request(write=True)
+        self.assertEqual(database, 'default')
+        pin = response.cookies[PIN_COOKIE]
+        self.assertEqual(pin['max-age'], settings.DATABASE_PIN_SECONDS)
+        database, response = self.request(cookies={PIN_COOKIE: pin.value})
+        self.assertEqual(database, 'default')
+        expired = {PIN_COOKIE: str(time.time() - 1)}
+        self.assertNotEqual(self.request(cookies=expired)[0], 'default')
+
+    @override_settings(POSTS_PAGE_CACHE=False)
+    def test_fresh_scope_read_from_primary(self):
+        """Сразу после записи то, что ляжет в кэш, читается с default."""
+        cache.clear()
+        databases = []
+
+        @caching.guest_page(lambda: ('fresh',))
+        def view(request):
+            databases.append(self.router.db_for_read(Post))
+            return HttpResponse()
+
+        request = RequestFactory().get('/')
+        caching.bump('fresh')
+        PrimaryPinMiddleware(view)(request)
+        cache.set(caching.MODIFIED_KEY.format('fresh'),
+                  timezone.now() - timedelta(
+                      seconds=settings.DATABASE_PIN_SECONDS + 1), None)
+        PrimaryPinMiddleware(view)(RequestFactory().get('/?page=2'))
+        self.assertEqual(databases[0], 'default')
+        self.assertNotEqual(databases[1], 'default')
+
+    def test_edit_views_read_primary(self):
+        """Формы создания и правки читают с основной базы."""
+        databases = []
+        view = use_primary(
+            lambda: databases.append(self.router.db_for_read(Post)))
+        view()
+        self.assertEqual(databases, ['default'])
+
+
+class SqlitePragmasTest(TestCase):
+    def connect(self, directory):
+        wrapper = DatabaseWrapper(
+            {**connection.settings_dict,
+             'NAME': os.path.join(directory, 'tuned.sqlite3')},
+            alias='tuned')
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    @override_settings(SQLITE_PRAGMAS={'journal_mode': 'WAL',
+                                       'synchronous': 'NORMAL',
+                                       'busy_timeout': 1234})
+    def test_pragmas_on_new_connection(self):
+        """Новое соединение SQLite получает PRAGMA из настроек."""
+        with tempfile.TemporaryDirectory() as directory:
+            wrapper = self.connect(directory)
+            self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+            # NORMAL
+            self.assertEqual(self.pragma(wrapper, 'synchronous'), 1)
+            self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 1234)
+            wrapper.close()
+
+    def test_default_profile_keeps_journal(self):
+        """Без профиля журнал остаётся обычным."""
+        with tempfile.TemporaryDirectory() as directory:
+            wrapper = self.connect(directory)
+            self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'delete')
+            wrapper.close()
+
+
+CACHED_SESSIONS = {
+    'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db',
+    'AUTHENTICATION_BACKENDS': ['core.auth.CachedModelBackend'],
+}
+
+
+@override_settings(**CACHED_SESSIONS, CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': os.path.join(tempfile.gettempdir(), 'yatube_auth_cache'),
+}})
+class CachedAuthTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='cached_auth',
+                                             password='old_pass')
+        self.client.login(username='cached_auth', password='old_pass')
+        self.url = reverse('posts:index')
+
+    def auth_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        return response, [
+            query['sql'] for query in queries
+            if 'django_session' in query['sql'] or 'auth_user' in query['sql']
+        ]
+
+    def test_session_and_user_from_cache(self):
+        """Вошедший пользователь не читает сессию и себя из базы."""
+        self.client.get(self.url)
+        response, queries = self.auth_queries()
+        self.assertEqual(queries, [])
+        self.assertEqual(response.context['user'], self.user)
+
+    def test_password_change_logs_out(self):
+        """После смены пароля закэшированный пользователь не принимается."""
+        self.client.get(self.url)
+        self.user.set_password('new_pass')
+        self.user.save()
+        response, queries = self.auth_queries()
+        self.assertFalse(response.context['user'].is_authenticated)
+
+    def test_logout_forgets_user(self):
+        """Выход убирает пользователя из кэша."""
+        self.client.get(self.url)
+        self.client.get(reverse('users:logout'))
+        self.assertIsNone(cache.get(USER_KEY.format(self.user.pk)))
+
+    def test_local_cache_rejected(self):
+        """С кэшем процесса сессии в кэше не проходят проверку."""
+        self.assertEqual(check_shared_cache(None), [])
+        with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            errors = check_shared_cache(None)
+        self.assertEqual([error.id for error in errors], ['core.E001'])
+
+
+@override_settings(TASKS_EAGER=False)
+class TaskQueueTest(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def run_worker(self):
+        call_command('run_worker', once=True, threads=1, stdout=StringIO())
+
+    def test_delay_queues_until_worker(self):
+        """delay пишет задачу в очередь, run_worker её выполняет."""
+        record.delay(1, label='первая')
+        self.assertEqual(calls, [])
+        self.assertEqual(Task.objects.get().name, 'core.tests.record')
+        self.run_worker()
+        self.assertEqual(calls, [(1, 'первая')])
+        self.assertFalse(Task.objects.exists())
+
+    @override_settings(TASKS_EAGER=True)
+    def test_eager_runs_at_once(self):
+        """При TASKS_EAGER задача выполняется сразу."""
+        record.delay(2)
+        self.assertEqual(calls, [(2, '')])
+        self.assertFalse(Task.objects.exists())
+
+    def test_failed_task_is_retried_with_backoff(self):
+        """Упавшая задача откладывается, после max_attempts - бросается."""
+        explode.delay()
+        self.run_worker()
+        queued = Task.objects.get()
+        self.assertEqual(queued.attempts, 1)
+        self.assertFalse(queued.failed)
+        self.assertGreater(queued.run_at, timezone.now())
+        self.assertIn('сбой задачи', queued.last_error)
+        self.run_worker()
+        self.assertEqual(Task.objects.get().attempts, 1)
+        Task.objects.update(run_at=timezone.now())
+        self.run_worker()
+        self.assertTrue(Task.objects.get().failed)
+
+    def test_post_search_index_is_deferred(self):
+        """Счётчики сдвигаются сразу, таблицу поиска пополняет воркер."""
+        if not search.fts5_available():
+            self.skipTest('SQLite без FTS5')
+        user = User.objects.create_user(username='worker_author')
+        group = Group.objects.create(title='Очередь', slug='queue')
+        post = Post.objects.create(text='Отложенная индексация', author=user,
+                                   group=group)
+        group.refresh_from_db()
+        user.profile.refresh_from_db()
+        self.assertEqual(group.posts_count, 1)
+        self.assertEqual(user.profile.posts_count, 1)
+        self.assertEqual(search.fts5.search('отложенная', 10), [])
+        self.run_worker()
+        self.assertEqual(search.fts5.search('отложенная', 10), [post.pk])
+
+    def test_bulk_index_after_later_post(self):
+        """Пакет попадает в поиск, даже если пост после него проиндексирован
+        раньше."""
+        if not search.fts5_available():
+            self.skipTest('SQLite без FTS5')
+        user = User.objects.create_user(username='bulk_author')
+        Post.objects.bulk_create(
+            Post(text='Пакетное яблоко', author=user) for _ in range(3))
+        post = Post.objects.create(text='Одиночное яблоко', author=user)
+        posts_tasks.index_post(post.pk)
+        posts_tasks.index_new_posts()
+        self.assertEqual(len(search.fts5.search('яблоко', 10)), 4)
+
+    def test_nothing_queued_without_fts5(self):
+        """Без таблицы FTS5 запись поста не ставит пустых задач."""
+        user = User.objects.create_user(username='plain_author')
+        with mock.patch.object(search, 'fts5_available', return_value=False):
+            post = Post.objects.create(text='Пост', author=user)
+            post.delete()
+            Post.objects.bulk_create([Post(text='Пакет', author=user)])
+        self.assertFalse(Task.objects.exists())
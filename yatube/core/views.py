@@ -0,0 +1,11 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+
+from core.middleware.timing import stats
+
+
+@staff_member_required
+def timing_stats(request):
+    """Скользящая статистика времени ответа по view, только для staff."""
+    return JsonResponse(stats.summary(), json_dumps_params={
+        'ensure_ascii': False})
@@ -1,14 +1,79 @@
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
 from .models import Group, Post
+from . import search
+from .utils import EstimatedPaginator
+
+
+class PreloadedAutocompleteSelect(AutocompleteSelect):
+    """
+    Автодополнение, которому выбранный объект можно передать заранее:
+    тогда его подпись не запрашивается из базы для каждой строки списка.
+    """
+    preloaded = None
+
+    def optgroups(self, name, value, attr=None):
+        if self.preloaded is None:
+            return super().optgroups(name, value, attr)
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, '', '', False, 0))
+        for obj in self.preloaded:
+            if str(obj.pk) in value:
+                options.append(self.create_option(
+                    name, obj.pk, self.choices.field.label_from_instance(obj),
+                    True, len(options)))
+        return [(None, options, 0)]
+
+
+class PostChangelistForm(forms.ModelForm):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # группа строки уже выбрана через list_select_related
+        for name in PostAdmin.list_editable:
+            widget = self.fields[name].widget
+            widget = getattr(widget, 'widget', widget)
+            related = getattr(self.instance, name)
+            widget.preloaded = [related] if related is not None else []
 
 
 class PostAdmin(admin.ModelAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author', 'group')
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
+    autocomplete_fields = ('author', 'group')
+    # вместо двух COUNT(*) по всей таблице - оценка из кэша
+    paginator = EstimatedPaginator
+    show_full_result_count = False
     empty_value_display = '-пусто-'
 
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name in self.get_autocomplete_fields(request):
+            kwargs.setdefault('widget', PreloadedAutocompleteSelect(
+                db_field.remote_field, self.admin_site,
+                using=kwargs.get('using')))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_changelist_form(self, request, **kwargs):
+        kwargs.setdefault('form', PostChangelistForm)
+        return super().get_changelist_form(request, **kwargs)
+
+    def get_search_results(self, request, queryset, search_term):
+        # вместо LIKE '%...%' по всей таблице идём в поисковый индекс
+        if not search_term:
+            return queryset, False
+        return queryset.filter(pk__in=search.search_ids(search_term)), False
+
+
+class GroupAdmin(admin.ModelAdmin):
+    list_display = ('title', 'slug', 'posts_count')
+    search_fields = ('title', 'slug')
+    prepopulated_fields = {'slug': ('title',)}
+
 
 admin.site.register(Post, PostAdmin)
-admin.site.register(Group)
+admin.site.register(Group, GroupAdmin)
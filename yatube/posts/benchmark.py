@@ -0,0 +1,217 @@
+import random
+import statistics
+import threading
+import time
+import tracemalloc
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import OperationalError, connection, models, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from faker import Faker
+
+from . import ranking, search
+from .counters import rebuild_counts
+from .models import Group, Post
+from .transfer import keep_pub_date
+from .utils import COUNT
+
+User = get_user_model()
+
+BATCH_SIZE = 5000
+# столько запросов из прогона повторяются под tracemalloc
+MEMORY_SAMPLES = 20
+
+
+def seed(posts, authors, groups, seed=0, stdout=None):
+    """Наполняет базу синтетическими авторами, группами и постами."""
+    fake = Faker('ru_RU')
+    fake.seed_instance(seed)
+    rnd = random.Random(seed)
+    User.objects.bulk_create(
+        (User(username=f'{fake.user_name()}_{i}',
+              first_name=fake.first_name(), last_name=fake.last_name())
+         for i in range(authors)),
+        batch_size=BATCH_SIZE,
+    )
+    Group.objects.bulk_create(
+        (Group(title=fake.catch_phrase()[:200], slug=f'group-{i}',
+               description=fake.text(200))
+         for i in range(groups)),
+        batch_size=BATCH_SIZE,
+    )
+    author_ids = list(User.objects.values_list('pk', flat=True))
+    group_ids = list(Group.objects.values_list('pk', flat=True)) + [None]
+    # генерировать миллион текстов Faker долго, берём их из пула
+    texts = [fake.paragraph(nb_sentences=3) for _ in range(1000)]
+    now = timezone.now()
+    created = 0
+    with keep_pub_date():
+        while created < posts:
+            size = min(BATCH_SIZE, posts - created)
+            # обычный bulk_create без сигнала bulk_created: счётчики,
+            # поисковый индекс и рейтинг дешевле собрать один раз в конце
+            with transaction.atomic():
+                models.QuerySet(Post).bulk_create(
+                    Post(text=rnd.choice(texts),
+                         pub_date=now - timedelta(
+                             seconds=rnd.randrange(3 * 365 * 24 * 3600)),
+                         author_id=rnd.choice(author_ids),
+                         group_id=rnd.choice(group_ids))
+                    for _ in range(size)
+                )
+            created += size
+            if stdout is not None:
+                stdout.write(f'Создано постов: {created}/{posts}')
+    rebuild_counts()
+    ranking.rescore()
+    for backend in search.active_backends():
+        backend.index_new()
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(share * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def measure(name, send, requests, cold=False):
+    """
+    Прогоняет send(i) requests раз и возвращает задержки p50/p99 в мс,
+    среднее число SQL-запросов и пик памяти Python на запрос.
+    """
+    send(0)
+    latencies, queries = [], []
+    for i in range(requests):
+        if cold:
+            cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            send(i)
+            latencies.append((time.perf_counter() - started) * 1000)
+        queries.append(len(captured))
+    tracemalloc.start()
+    try:
+        for i in range(min(requests, MEMORY_SAMPLES)):
+            send(i)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        'view': name,
+        'requests': requests,
+        'p50_ms': round(statistics.median(latencies), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'mean_ms': round(statistics.mean(latencies), 3),
+        'queries_per_request': round(statistics.mean(queries), 2),
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+def run(requests, cold=False, seed=0):
+    """Замеряет ленты, страницу поста и создание поста."""
+    rnd = random.Random(seed)
+    client = Client()
+    writer = Client()
+    writer.force_login(User.objects.order_by('pk').first())
+    usernames = list(User.objects.order_by('?').values_list(
+        'username', flat=True)[:requests])
+    slugs = list(Group.objects.order_by('?').values_list(
+        'slug', flat=True)[:requests])
+    post_ids = list(Post.objects.order_by('?').values_list(
+        'pk', flat=True)[:requests])
+
+    def page():
+        return {'page': rnd.randint(1, 50)}
+
+    views = {
+        'index': lambda i: client.get(reverse('posts:index'), page()),
+        'group_posts': lambda i: client.get(
+            reverse('posts:groups', args=(slugs[i % len(slugs)],)), page()),
+        'profile': lambda i: client.get(
+            reverse('posts:profile', args=(usernames[i % len(usernames)],))),
+        'post_detail': lambda i: client.get(
+            reverse('posts:post_detail', args=(post_ids[i % len(post_ids)],))),
+        'post_create': lambda i: writer.post(
+            reverse('posts:post_create'), {'text': f'Замер {i}'}),
+    }
+    return [measure(name, send, requests, cold)
+            for name, send in views.items()]
+
+
+def _reader(stop, result):
+    latencies, errors = [], 0
+    try:
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                # страница ленты и число постов, как в index без кэша
+                list(Post.objects.feed()[:COUNT])
+                Post.objects.count()
+            except OperationalError:
+                errors += 1
+            else:
+                latencies.append((time.perf_counter() - started) * 1000)
+    finally:
+        connection.close()
+    result.update(latencies=latencies, errors=errors)
+
+
+def _writer(stop, result, author_ids, rnd):
+    writes, errors = 0, 0
+    try:
+        while not stop.is_set():
+            try:
+                Post.objects.create(text='Запись под нагрузкой',
+                                    author_id=rnd.choice(author_ids))
+            except OperationalError:
+                errors += 1
+            else:
+                writes += 1
+    finally:
+        connection.close()
+    result.update(writes=writes, errors=errors)
+
+
+def run_concurrent(seconds, readers, writers, seed=0):
+    """
+    Читает ленту в readers потоках, пока writers потоков создают посты.
+    Возвращает пропускную способность чтения и записи и число ошибок.
+    """
+    rnd = random.Random(seed)
+    author_ids = list(User.objects.values_list('pk', flat=True))
+    stop = threading.Event()
+    read_results = [{} for _ in range(readers)]
+    write_results = [{} for _ in range(writers)]
+    threads = [
+        threading.Thread(target=_reader, args=(stop, result))
+        for result in read_results
+    ] + [
+        threading.Thread(target=_writer,
+                         args=(stop, result, author_ids,
+                               random.Random(rnd.random())))
+        for result in write_results
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    latencies = [value for result in read_results
+                 for value in result['latencies']]
+    return {
+        'reads_per_second': round(len(latencies) / seconds, 1),
+        'read_p50_ms': round(statistics.median(latencies), 3)
+        if latencies else None,
+        'read_p99_ms': round(percentile(latencies, 0.99), 3)
+        if latencies else None,
+        'read_errors': sum(result['errors'] for result in read_results),
+        'writes_per_second': round(
+            sum(result['writes'] for result in write_results) / seconds, 1),
+        'write_errors': sum(result['errors'] for result in write_results),
+    }
@@ -0,0 +1,348 @@
+import hashlib
+import math
+import random
+import time
+from contextlib import nullcontext
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.views.decorators.http import condition
+
+from core.db import primary_reads
+from .models import Group, Post
+
+User = get_user_model()
+
+VERSION_KEY = 'posts:version:{}'
+MODIFIED_KEY = 'posts:modified:{}'
+PAGE_KEY = 'posts:page:{}'
+LOCK_KEY = '{}:lock'
+INDEX_SCOPE = 'index'
+GROUPS_SCOPE = 'groups'
+# лента популярного меняется и без записи постов: при пересчёте рейтинга
+POPULAR_SCOPE = 'popular'
+# сколько держится блокировка пересчёта и как часто её проверяют
+LOCK_TIMEOUT = 10
+LOCK_POLL = 0.05
+# XFetch: чем больше, тем раньше значение обновляется до истечения
+EARLY_REFRESH_BETA = 1.0
+
+
+# slug и имя пользователя хэшируются: в них бывают пробелы и кириллица,
+# а ключи memcached допускают только ASCII без пробелов
+def group_scope(slug):
+    return f'group:{_digest(slug)}'
+
+
+def profile_scope(username):
+    return f'profile:{_digest(username)}'
+
+
+def post_scope(pk):
+    return f'post:{pk}'
+
+
+def _initial_version():
+    # версия от времени не совпадёт с прежней, даже если ключ вытеснен
+    return time.time_ns() // 1000
+
+
+def scope_version(scope):
+    """Текущая версия области: ленты, группы, профиля или поста."""
+    return scope_versions(scope)[0]
+
+
+def scope_versions(*scopes):
+    """Версии нескольких областей одним обращением к кэшу."""
+    keys = [VERSION_KEY.format(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _initial_version(), None)
+            versions[key] = cache.get(key)
+    return tuple(versions[key] for key in keys)
+
+
+def scope_modified(*scopes):
+    """Время последнего изменения самой свежей из областей."""
+    keys = [MODIFIED_KEY.format(scope) for scope in scopes]
+    stamps = cache.get_many(keys)
+    for key in keys:
+        if key not in stamps:
+            # отметка вытеснена: считаем, что область изменилась сейчас,
+            # иначе клиент может получить 304 на устаревшую страницу
+            cache.add(key, timezone.now(), None)
+            stamps[key] = cache.get(key)
+    return max(stamps.values())
+
+
+def lagging(*scopes):
+    """
+    Менялись ли области так недавно, что реплики могли не догнать запись.
+    Версия уже сдвинута, и прочитанное с реплики легло бы в кэш под новой
+    версией на весь срок; за отставание принимается DATABASE_PIN_SECONDS.
+    """
+    if not settings.DATABASE_REPLICAS:
+        return False
+    window = timedelta(seconds=settings.DATABASE_PIN_SECONDS)
+    return scope_modified(*scopes) > timezone.now() - window
+
+
+def fresh_reads(*scopes):
+    """Контекст чтения: с основной базы, пока области недавно менялись."""
+    return primary_reads() if lagging(*scopes) else nullcontext()
+
+
+def bump(*scopes):
+    """Сдвигает версии областей, делая их кэш недоступным."""
+    for scope in scopes:
+        key = VERSION_KEY.format(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _initial_version(), None)
+    now = timezone.now()
+    cache.set_many({MODIFIED_KEY.format(scope): now for scope in scopes},
+                   None)
+
+
+# версия и список групп для формы поста, общий для потоков процесса
+_group_choices = (None, [])
+
+
+def group_choices():
+    """
+    Пары (id, название) всех групп для выбора в форме поста. Список
+    хранится в памяти процесса и перечитывается, когда сдвинулась
+    общая версия групп, то есть после сохранения или удаления группы.
+    """
+    global _group_choices
+    version = scope_version(GROUPS_SCOPE)
+    cached_version, choices = _group_choices
+    if cached_version != version:
+        choices = list(Group.objects.order_by('title', 'pk')
+                       .values_list('pk', 'title'))
+        _group_choices = (version, choices)
+    return choices
+
+
+def _is_fresh(expires, delta):
+    # XFetch: чем ближе истечение и дороже пересчёт, тем вероятнее,
+    # что этот запрос обновит значение заранее, пока оно ещё в кэше
+    early = delta * EARLY_REFRESH_BETA * -math.log(1 - random.random())
+    return time.time() + early < expires
+
+
+def fetch(key, compute, timeout, valid=None, storable=None):
+    """
+    Значение из кэша с защитой от одновременного пересчёта.
+    Пересчитывает только запрос, взявший блокировку через cache.add;
+    остальные получают устаревшее значение или ждут нового. Значение
+    хранится дольше timeout, чтобы было что отдать во время пересчёта.
+    valid отбраковывает записи, которые нельзя отдавать даже устаревшими,
+    storable - результаты, которые нельзя класть в кэш.
+    """
+    lock = LOCK_KEY.format(key)
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while True:
+        entry = cache.get(key)
+        if entry is not None and valid is not None and not valid(entry[0]):
+            entry = None
+        if entry is not None and _is_fresh(*entry[1:]):
+            return entry[0]
+        if cache.add(lock, True, LOCK_TIMEOUT):
+            break
+        if entry is not None:
+            return entry[0]
+        if time.monotonic() >= deadline:
+            # держатель блокировки завис: считаем сами
+            return compute()
+        time.sleep(LOCK_POLL)
+    try:
+        started = time.time()
+        value = compute()
+        delta = time.time() - started
+        if storable is None or storable(value):
+            cache.set(key, (value, time.time() + timeout, delta), timeout * 2)
+        return value
+    finally:
+        cache.delete(lock)
+
+
+def invalidate_posts(author_ids, group_ids, post_ids=()):
+    """
+    Сбрасывает кэш лент, где показаны посты этих авторов и групп,
+    и кэш страниц самих постов.
+    """
+    usernames = User.objects.filter(
+        pk__in={pk for pk in author_ids if pk is not None}
+    ).values_list('username', flat=True)
+    slugs = Group.objects.filter(
+        pk__in={pk for pk in group_ids if pk is not None}
+    ).values_list('slug', flat=True)
+    bump(INDEX_SCOPE,
+         *(profile_scope(username) for username in usernames),
+         *(group_scope(slug) for slug in slugs),
+         *(post_scope(pk) for pk in post_ids))
+
+
+def _page_params(request):
+    # параметры, от которых зависит страница ленты
+    return tuple(request.GET.get(name, '')
+                 for name in ('page', 'cursor', 'sort'))
+
+
+def _sort_scopes(request):
+    if request.GET.get('sort') == 'popular':
+        return (POPULAR_SCOPE,)
+    return ()
+
+
+def feed_cache(request, scope):
+    """Контекст для кэша фрагмента ленты: ключ страницы и время жизни."""
+    params = ':'.join(_page_params(request))
+    versions = ':'.join(
+        map(str, scope_versions(scope, *_sort_scopes(request))))
+    return {
+        'feed_key': f'{scope}:{versions}:{params}',
+        'feed_timeout': settings.POSTS_FEED_CACHE_TIMEOUT,
+    }
+
+
+def post_detail_scopes(post):
+    # на странице поста выводится и число постов автора, и ссылка на
+    # группу; удаление группы обнуляет group без сигналов постов, поэтому
+    # берётся общая версия групп, а не группы поста
+    return (post_scope(post.pk), profile_scope(post.author.username),
+            GROUPS_SCOPE)
+
+
+def cached_post(post_id):
+    """
+    Пост для страницы поста вместе с автором, его счётчиком и группой.
+    Пост берётся из кэша, пока не сдвинулись версии его областей;
+    вторым значением отдаётся ключ для кэша фрагментов страницы.
+    """
+    def read():
+        return get_object_or_404(
+            Post.objects.select_related('author__profile', 'group'),
+            id=post_id
+        )
+
+    def compute():
+        with fresh_reads(post_scope(post_id)):
+            post = read()
+        if (not lagging(post_scope(post_id))
+                and lagging(*post_detail_scopes(post))):
+            # автор или группа только что изменились: реплика могла
+            # отдать старые
+            with primary_reads():
+                post = read()
+        return post, scope_versions(*post_detail_scopes(post))
+
+    def valid(entry):
+        post, versions = entry
+        return scope_versions(*post_detail_scopes(post)) == versions
+
+    post, versions = fetch(f'posts:detail:{post_id}', compute,
+                           settings.POSTS_DETAIL_CACHE_TIMEOUT, valid=valid)
+    return post, f'{post_id}:{versions}'
+
+
+def detail_scopes(post_id):
+    """Области страницы поста; сам пост обычно уже в кэше."""
+    post, detail_key = cached_post(post_id)
+    return post_detail_scopes(post)
+
+
+def _digest(*parts):
+    return hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest()
+
+
+def _validator(request, scopes, per_viewer=True):
+    viewer = ''
+    if per_viewer:
+        # страница зависит и от того, кто её смотрит: имя в шапке, ссылки
+        user = request.user
+        viewer = str(user.pk) if user.is_authenticated else 'anonymous'
+    return _digest(request.path, *scopes, *scope_versions(*scopes), viewer,
+                   *_page_params(request))
+
+
+def conditional(get_scopes, per_viewer=True):
+    """
+    Поддержка ETag и Last-Modified для страницы по версиям её областей:
+    get_scopes получает аргументы представления и возвращает области.
+    Тело страницы для ответа 304 не строится. per_viewer=False - для
+    ответов, одинаковых для всех, например лент RSS.
+    """
+    def etag(request, *args, **kwargs):
+        scopes = (*get_scopes(*args, **kwargs), *_sort_scopes(request))
+        return _validator(request, scopes, per_viewer)
+
+    def last_modified(request, *args, **kwargs):
+        return scope_modified(*get_scopes(*args, **kwargs),
+                              *_sort_scopes(request))
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def conditional_post(view):
+    """То же для страницы поста: время правки берётся из updated_at."""
+    def etag(request, post_id):
+        return _validator(request, detail_scopes(post_id))
+
+    def last_modified(request, post_id):
+        post, detail_key = cached_post(post_id)
+        related_modified = scope_modified(
+            profile_scope(post.author.username), GROUPS_SCOPE)
+        return max(post.updated_at, related_modified)
+
+    return condition(etag_func=etag, last_modified_func=last_modified)(view)
+
+
+def _is_guest(request):
+    # без cookie сессии посетитель точно гость, сессию можно не читать
+    return (request.method == 'GET'
+            and settings.SESSION_COOKIE_NAME not in request.COOKIES)
+
+
+def _is_shareable(request, response):
+    # страницу с CSRF-токеном или изменённой сессией отдавать другим нельзя
+    return (response.status_code == 200
+            and not response.cookies
+            and not request.META.get('CSRF_COOKIE_USED')
+            and not request.session.modified)
+
+
+def guest_page(get_scopes):
+    """
+    Кэш целых страниц для гостей: ключ из адреса с параметрами и версий
+    областей страницы, так что попадание обходится без базы данных.
+    Пользователи с сессией получают страницу от представления. Сразу
+    после изменения областей страница читается с основной базы.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            scopes = (*get_scopes(*args, **kwargs), *_sort_scopes(request))
+            # страница и её фрагменты кэшируются под новыми версиями
+            with fresh_reads(*scopes):
+                if not settings.POSTS_PAGE_CACHE or not _is_guest(request):
+                    return view(request, *args, **kwargs)
+                key = PAGE_KEY.format(_digest(
+                    request.get_full_path(), *scopes,
+                    *scope_versions(*scopes)))
+                return fetch(
+                    key, lambda: view(request, *args, **kwargs),
+                    settings.POSTS_PAGE_CACHE_TIMEOUT,
+                    storable=lambda response: _is_shareable(request,
+                                                            response),
+                )
+        return wrapper
+    return decorator
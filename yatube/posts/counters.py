@@ -0,0 +1,46 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from users.models import Profile
+from .models import Group, Post
+
+User = get_user_model()
+
+
+def _shift(queryset, delta):
+    if delta > 0:
+        queryset.update(posts_count=F('posts_count') + delta)
+    elif delta < 0:
+        # разъехавшийся счётчик не уводим в минус, его чинит пересчёт
+        queryset.filter(posts_count__gte=-delta).update(
+            posts_count=F('posts_count') + delta
+        )
+
+
+def change_counts(authors=None, groups=None):
+    """Сдвигает счётчики постов; аргументы — словари {id: приращение}."""
+    for author_id, delta in (authors or {}).items():
+        if author_id is not None:
+            _shift(Profile.objects.filter(user_id=author_id), delta)
+    for group_id, delta in (groups or {}).items():
+        if group_id is not None:
+            _shift(Group.objects.filter(pk=group_id), delta)
+
+
+def _posts_count(field, outer):
+    posts = (Post.objects.filter(**{field: OuterRef(outer)})
+             .order_by().values(field)
+             .annotate(total=Count('pk')).values('total'))
+    return Coalesce(Subquery(posts, output_field=IntegerField()), 0)
+
+
+def rebuild_counts():
+    """Пересчитывает все счётчики постов с нуля."""
+    missing = User.objects.filter(profile__isnull=True).values_list(
+        'pk', flat=True)
+    Profile.objects.bulk_create(
+        (Profile(user_id=pk) for pk in missing.iterator()), batch_size=500
+    )
+    Profile.objects.update(posts_count=_posts_count('author', 'user'))
+    Group.objects.update(posts_count=_posts_count('group', 'pk'))
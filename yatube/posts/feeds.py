@@ -0,0 +1,81 @@
+import io
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+from django.utils import feedgenerator
+from django.utils.xmlutils import SimplerXMLGenerator
+
+
+class StreamingFeedMixin:
+    """
+    Лента, которая пишется по частям: заголовок, затем записи по одной
+    по мере чтения из базы, затем закрывающие теги closing_tags.
+    """
+
+    def latest_post_date(self):
+        return self.feed.get('updated') or super().latest_post_date()
+
+    def stream(self, entries, encoding='utf-8'):
+        document = io.StringIO()
+        self.write(document, encoding)
+        document = document.getvalue()
+        yield document[:-len(self.closing_tags)]
+        buffer = io.StringIO()
+        handler = SimplerXMLGenerator(buffer, encoding)
+        for entry in entries:
+            self.items = []
+            self.add_item(**entry)
+            self.write_items(handler)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield self.closing_tags
+
+
+class StreamingRssFeed(StreamingFeedMixin, feedgenerator.Rss201rev2Feed):
+    closing_tags = '</channel></rss>'
+
+
+class StreamingAtomFeed(StreamingFeedMixin, feedgenerator.Atom1Feed):
+    closing_tags = '</feed>'
+
+
+FORMATS = {'rss': StreamingRssFeed, 'atom': StreamingAtomFeed}
+
+
+def _entries(request, posts):
+    for post in posts.iterator():
+        link = request.build_absolute_uri(
+            reverse('posts:post_detail', args=(post.pk,)))
+        yield {
+            'title': str(post),
+            'link': link,
+            'description': post.text,
+            'unique_id': link,
+            'author_name': post.author.get_full_name()
+            or post.author.username,
+            'pubdate': post.pub_date,
+            'updateddate': post.updated_at,
+            'categories': (post.group.title,) if post.group else (),
+        }
+
+
+def feed_response(request, fmt, posts, title, link, updated):
+    """
+    Потоковый ответ с лентой RSS или Atom из последних постов posts:
+    записи пишутся в ответ по мере чтения из базы.
+    """
+    feed = FORMATS[fmt](
+        title=title,
+        link=request.build_absolute_uri(link),
+        description=title,
+        language=settings.LANGUAGE_CODE,
+        feed_url=request.build_absolute_uri(),
+        updated=updated,
+    )
+    posts = posts[:settings.POSTS_FEED_ITEMS]
+    return StreamingHttpResponse(
+        feed.stream(_entries(request, posts)),
+        content_type=feed.content_type,
+    )
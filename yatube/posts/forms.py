@@ -1,7 +1,50 @@
+from django import forms
+from django.conf import settings
 from django.forms import ModelForm
+from django.forms.models import ModelChoiceIterator
+from django.urls import reverse_lazy
+
+from .caching import group_choices
 from .models import Post
 
 
+class GroupChoiceIterator(ModelChoiceIterator):
+    """Варианты групп из кэша в памяти, без SELECT по всем группам."""
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        yield from group_choices()
+
+    def __len__(self):
+        return len(group_choices()) + (self.field.empty_label is not None)
+
+
+class GroupLookupWidget(forms.Select):
+    """
+    Выбор группы через поиск: в разметку попадает только выбранная
+    группа, остальные подгружаются скриптом с posts:group_lookup.
+    """
+
+    class Media:
+        js = ('js/group_lookup.js',)
+
+    def __init__(self, attrs=None):
+        attrs = {'data-lookup-url': reverse_lazy('posts:group_lookup'),
+                 **(attrs or {})}
+        super().__init__(attrs)
+
+    def optgroups(self, name, value, attrs=None):
+        selected = set(value)
+        choices = self.choices
+        self.choices = [(pk, title) for pk, title in choices
+                        if str(pk) in selected or pk == '']
+        try:
+            return super().optgroups(name, value, attrs)
+        finally:
+            self.choices = choices
+
+
 class PostForm(ModelForm):
     class Meta():
         model = Post
@@ -9,3 +52,12 @@ class PostForm(ModelForm):
         labels = {'text': 'Текст поста', 'group': 'Группа поста'}
         help_text = {'text': 'Текст нового поста',
                      'group': 'Группа которой будет присвоен пост'}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # проверка выбранной группы - один запрос по первичному ключу
+        group = self.fields['group']
+        group.iterator = GroupChoiceIterator
+        if len(group_choices()) > settings.POSTS_GROUP_SELECT_LIMIT:
+            group.widget = GroupLookupWidget()
+        group.widget.choices = group.choices
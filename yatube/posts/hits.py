@@ -0,0 +1,106 @@
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+from django.conf import settings
+from django.db import DatabaseError, connections, router
+from django.db.models import Case, F, IntegerField, Value, When
+
+from . import ranking
+from .models import Post
+
+logger = logging.getLogger('yatube.hits')
+
+# просмотры копятся в памяти процесса и пишутся пачкой: каждый процесс
+# прибавляет свои через F(), поэтому процессы не затирают друг друга
+_pending = Counter()
+# база, в которой засчитаны просмотры: тесты и замеры подменяют default
+_pending_database = None
+_lock = threading.Lock()
+_flushed_at = time.monotonic()
+
+
+def _database():
+    return connections[router.db_for_write(Post)].settings_dict['NAME']
+
+
+def record(post_id):
+    """Засчитывает просмотр поста; пора - сбрасывает накопленное в базу."""
+    global _pending, _pending_database
+    database = _database()
+    with _lock:
+        if _pending_database != database:
+            # просмотры из другой базы туда уже не записать
+            _pending, _pending_database = Counter(), database
+        _pending[post_id] += 1
+        due = (sum(_pending.values()) >= settings.POSTS_VIEWS_FLUSH_HITS
+               or time.monotonic() - _flushed_at
+               >= settings.POSTS_VIEWS_FLUSH_SECONDS)
+    if due:
+        try:
+            flush()
+        except DatabaseError:
+            # база занята: просмотры остались в счётчике, страница важнее
+            logger.warning('Не удалось записать просмотры', exc_info=True)
+
+
+def flush():
+    """
+    Пишет накопленные просмотры одним UPDATE с CASE по id постов
+    и пересчитывает рейтинг этих постов.
+    Если база недоступна, просмотры возвращаются в счётчик до следующего
+    раза; просмотры из базы, которая уже не default, отбрасываются.
+    Возвращает число записанных просмотров.
+    """
+    global _pending, _flushed_at
+    with _lock:
+        hits, _pending = _pending, Counter()
+        _flushed_at = time.monotonic()
+        database = _pending_database
+    if not hits or database != _database():
+        return 0
+    try:
+        Post.objects.filter(pk__in=hits).update(views=F('views') + Case(
+            *(When(pk=pk, then=Value(count)) for pk, count in hits.items()),
+            default=Value(0), output_field=IntegerField(),
+        ))
+    except DatabaseError:
+        with _lock:
+            if _pending_database == database:
+                _pending.update(hits)
+        raise
+    # рейтинг меняется только с просмотрами: пересчитываем просмотренные
+    ranking.rescore(hits)
+    return sum(hits.values())
+
+
+def discard():
+    """Забывает накопленные просмотры: перед сменой или удалением базы."""
+    global _pending, _flushed_at
+    with _lock:
+        _pending = Counter()
+        _flushed_at = time.monotonic()
+
+
+def counted(view):
+    """Считает просмотры страницы поста, в том числе из кэша и 304."""
+    @wraps(view)
+    def wrapper(request, post_id, *args, **kwargs):
+        response = view(request, post_id, *args, **kwargs)
+        if request.method == 'GET' and response.status_code in (200, 304):
+            record(post_id)
+        return response
+    return wrapper
+
+
+@atexit.register
+def _flush_at_exit():
+    # при остановке процесса теряется не больше одного окна просмотров;
+    # базы к этому моменту может уже не быть, падать тут незачем
+    try:
+        flush()
+    except Exception:
+        pass
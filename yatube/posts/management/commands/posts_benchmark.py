@@ -0,0 +1,75 @@
+import json
+import platform
+import subprocess
+import sys
+
+import django
+from django.core.management.base import BaseCommand
+from django.test.utils import (setup_databases, setup_test_environment,
+                               teardown_databases, teardown_test_environment)
+from django.utils import timezone
+
+from posts import benchmark, hits
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет задержку, число SQL-запросов и пик памяти основных '
+        'страниц на синтетических данных во временной тестовой базе. '
+        'Результат пишется в JSON для сравнения между коммитами.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1000000)
+        parser.add_argument('--authors', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=1000)
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Запросов на каждую страницу.')
+        parser.add_argument('--cold', action='store_true',
+                            help='Очищать кэш перед каждым запросом.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', default='-',
+                            help='Файл для JSON, по умолчанию stdout.')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            benchmark.seed(options['posts'], options['authors'],
+                           options['groups'], seed=options['seed'],
+                           stdout=self.stderr)
+            results = benchmark.run(options['requests'],
+                                    cold=options['cold'],
+                                    seed=options['seed'])
+        finally:
+            # синтетические просмотры не должны попасть в настоящую базу
+            hits.discard()
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+        report = {
+            'revision': git_revision(),
+            'created': timezone.now().isoformat(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'django': django.get_version(),
+            'dataset': {key: options[key]
+                        for key in ('posts', 'authors', 'groups', 'seed')},
+            'cold_cache': options['cold'],
+            'views': results,
+        }
+        payload = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output'] == '-':
+            self.stdout.write(payload)
+        else:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                stream.write(payload + '\n')
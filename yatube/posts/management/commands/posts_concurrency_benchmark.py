@@ -0,0 +1,71 @@
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import (override_settings, setup_databases,
+                               setup_test_environment, teardown_databases,
+                               teardown_test_environment)
+
+from posts import benchmark
+
+# WAL сохраняется в файле базы, поэтому обычный профиль идёт первым
+# и явно возвращает журнал в режим DELETE
+PROFILES = {
+    'default': {'journal_mode': 'DELETE'},
+    'production': settings.SQLITE_PRODUCTION_PRAGMAS,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность чтения ленты во время записи '
+        'постов для обычного и продакшен-профиля SQLite. Тестовая база '
+        'создаётся во временном файле.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--authors', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--seconds', type=float, default=10)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=1)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Замер предназначен для SQLite.')
+        directory = tempfile.mkdtemp()
+        # потокам нужна общая база в файле, а не в памяти
+        connection.settings_dict['TEST']['NAME'] = os.path.join(
+            directory, 'concurrency.sqlite3')
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            benchmark.seed(options['posts'], options['authors'],
+                           options['groups'], seed=options['seed'],
+                           stdout=self.stderr)
+            results = {}
+            for name, pragmas in PROFILES.items():
+                with override_settings(SQLITE_PRAGMAS=pragmas):
+                    connections.close_all()
+                    self.stderr.write(f'Профиль {name}...')
+                    results[name] = benchmark.run_concurrent(
+                        options['seconds'], options['readers'],
+                        options['writers'], seed=options['seed'])
+        finally:
+            connections.close_all()
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+            os.rmdir(directory)
+        report = {
+            'dataset': {key: options[key]
+                        for key in ('posts', 'authors', 'groups', 'seed')},
+            'threads': {key: options[key]
+                        for key in ('seconds', 'readers', 'writers')},
+            'profiles': results,
+        }
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Counted:
+    """Обёртка итератора, считающая отданные строки."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.total = 0
+
+    def __iter__(self):
+        for row in self.rows:
+            self.total += 1
+            yield row
+
+
+class Command(BaseCommand):
+    help = 'Потоково выгружает посты или группы в NDJSON или CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', nargs='?', default='-',
+                            help='Файл для выгрузки, по умолчанию stdout.')
+        parser.add_argument('--model', choices=tuple(transfer.FIELDS),
+                            default='post')
+        parser.add_argument('--format', choices=transfer.FORMATS,
+                            default='ndjson')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        model, fmt = options['model'], options['format']
+        started = time.monotonic()
+        rows = Counted(transfer.export_rows(model, options['chunk_size']))
+        if options['output'] == '-':
+            transfer.write_rows(rows, self.stdout, fmt, model)
+        else:
+            with open(options['output'], 'w', encoding='utf-8',
+                      newline='') as stream:
+                transfer.write_rows(rows, stream, fmt, model)
+        elapsed = max(time.monotonic() - started, 1e-6)
+        # итог в stderr, чтобы не смешивать его с данными в stdout
+        self.stderr.write(
+            f'Выгружено строк: {rows.total} '
+            f'({rows.total / elapsed:.0f} строк/с)'
+        )
@@ -0,0 +1,51 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = 'Загружает посты или группы из NDJSON или CSV пачками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', nargs='?', default='-',
+                            help='Файл для загрузки, по умолчанию stdin.')
+        parser.add_argument('--model', choices=tuple(transfer.FIELDS),
+                            default='post')
+        parser.add_argument('--format', choices=transfer.FORMATS,
+                            default='ndjson')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['input'] == '-':
+            self.load(sys.stdin, options)
+        else:
+            with open(options['input'], encoding='utf-8',
+                      newline='') as stream:
+                self.load(stream, options)
+
+    def load(self, stream, options):
+        rows = transfer.read_rows(stream, options['format'])
+        batches = transfer.import_rows(
+            options['model'], rows, options['batch_size'])
+        started = time.monotonic()
+        read = written = 0
+        while True:
+            with transaction.atomic():
+                batch = next(batches, None)
+            if batch is None:
+                break
+            read += batch[0]
+            written += batch[1]
+            elapsed = max(time.monotonic() - started, 1e-6)
+            self.stdout.write(
+                f'Прочитано {read}, записано {written} '
+                f'({read / elapsed:.0f} строк/с)'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: записано {written} из {read}, '
+            f'пропущено {read - written}.'
+        ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts.ranking import BATCH_SIZE, rescore
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рейтинг популярности всех постов: после загрузки '
+        'в обход сигналов или смены POSTS_POPULAR_DECAY.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        total = rescore(batch_size=options['batch_size'])
+        self.stdout.write(f'Пересчитано постов: {total}')
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.counters import rebuild_counts
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов авторов и групп с нуля.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rebuild_counts()
+        self.stdout.write(self.style.SUCCESS('Счётчики постов пересчитаны.'))
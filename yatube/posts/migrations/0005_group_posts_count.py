@@ -0,0 +1,46 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_counts(apps, schema_editor):
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    Profile = apps.get_model('users', 'Profile')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    # чтение через роутер ушло бы на реплики
+    db = schema_editor.connection.alias
+
+    def counts(field):
+        return dict(Post.objects.using(db).order_by().values_list(field)
+                    .annotate(total=models.Count('pk')))
+
+    by_author = counts('author_id')
+    Profile.objects.using(db).bulk_create(
+        (Profile(user_id=pk, posts_count=by_author.get(pk, 0))
+         for pk in User.objects.using(db).values_list('pk', flat=True)
+         .iterator()),
+        batch_size=500,
+    )
+    for group_id, total in counts('group_id').items():
+        Group.objects.using(db).filter(pk=group_id).update(
+            posts_count=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0004_post_feed_indexes'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:13
+
+import math
+
+from django.conf import settings
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def fill_score(apps, schema_editor):
+    # то же, что posts.models.popularity на момент миграции
+    Post = apps.get_model('posts', 'Post')
+    posts = Post.objects.using(schema_editor.connection.alias).order_by('pk')
+    last_pk = 0
+    while True:
+        batch = list(posts.filter(pk__gt=last_pk).only(
+            'views', 'pub_date')[:BATCH_SIZE])
+        if not batch:
+            return
+        for post in batch:
+            post.score = (math.log10(1 + post.views)
+                          + post.pub_date.timestamp()
+                          / settings.POSTS_POPULAR_DECAY)
+        posts.bulk_update(batch, ['score'])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_post_views'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='score',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['score'], name='posts_post_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', 'score'], name='posts_post_group_score_idx'),
+        ),
+        migrations.RunPython(fill_score, migrations.RunPython.noop),
+    ]
@@ -1,22 +1,64 @@
-from django.db import models
+import math
+
+from django.conf import settings
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.dispatch import Signal
+from django.utils import timezone
 
 User = get_user_model()
 
+# bulk_create не отправляет post_save, поэтому шлём свой сигнал
+bulk_created = Signal(providing_args=['objs'])
+
+
+def popularity(views, pub_date):
+    """
+    Рейтинг поста для ленты популярного: десятикратный рост просмотров
+    стоит POSTS_POPULAR_DECAY секунд свежести. Время входит через дату
+    публикации, так что рейтинг меняется только вместе с просмотрами.
+    """
+    return (math.log10(1 + views)
+            + pub_date.timestamp() / settings.POSTS_POPULAR_DECAY)
+
 
 class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField()
+    posts_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        now = timezone.now()
+        for obj in objs:
+            obj.score = popularity(obj.views, obj.pub_date or now)
+        objs = super().bulk_create(objs, *args, **kwargs)
+        bulk_created.send(sender=self.model, objs=objs)
+        return objs
+
+    def feed(self):
+        """Посты для лент: автор и группа одним JOIN, только нужные поля."""
+        return self.select_related('author', 'group').only(
+            'text', 'pub_date', 'updated_at', 'score', 'author', 'group',
+            'author__username', 'author__first_name', 'author__last_name',
+            'group__title', 'group__slug',
+        )
+
+
 class Post(models.Model):
     text = models.TextField()
     pub_date = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # пишется пачками из posts.hits, сигналы и updated_at не трогает
+    views = models.PositiveIntegerField(default=0, editable=False)
+    # popularity(): ставится при создании, пересчитывается posts.ranking
+    score = models.FloatField(default=0, editable=False)
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -28,5 +70,22 @@ class Post(models.Model):
                               on_delete=models.SET_NULL
                               )
 
+    objects = PostQuerySet.as_manager()
+
+    class Meta:
+        ordering = ('-pub_date', '-id')
+        indexes = (
+            models.Index(fields=('pub_date',),
+                         name='posts_post_pub_date_idx'),
+            models.Index(fields=('group', 'pub_date'),
+                         name='posts_post_group_pub_date_idx'),
+            models.Index(fields=('author', 'pub_date'),
+                         name='posts_post_author_pub_date_idx'),
+            models.Index(fields=('score',),
+                         name='posts_post_score_idx'),
+            models.Index(fields=('group', 'score'),
+                         name='posts_post_group_score_idx'),
+        )
+
     def __str__(self):
         return self.text[:15]
@@ -0,0 +1,40 @@
+from django.db import router
+from django.db.models import Case, FloatField, Value, When
+
+from .caching import POPULAR_SCOPE, bump
+from .models import Post, popularity
+
+BATCH_SIZE = 1000
+
+
+def _write_scores(rows):
+    Post.objects.filter(pk__in=[pk for pk, views, pub_date in rows]).update(
+        score=Case(
+            *(When(pk=pk, then=Value(popularity(views, pub_date)))
+              for pk, views, pub_date in rows),
+            output_field=FloatField(),
+        )
+    )
+
+
+def rescore(post_ids=None, batch_size=BATCH_SIZE):
+    """
+    Пересчитывает рейтинг постов post_ids или всех постов пачками по id.
+    Просмотры читаются с основной базы, куда их пишет posts.hits.
+    Возвращает число пересчитанных постов.
+    """
+    queryset = Post.objects.using(router.db_for_write(Post)).order_by('pk')
+    if post_ids is not None:
+        queryset = queryset.filter(pk__in=list(post_ids))
+    total, last_pk = 0, 0
+    while True:
+        rows = list(queryset.filter(pk__gt=last_pk).values_list(
+            'pk', 'views', 'pub_date')[:batch_size])
+        if not rows:
+            if total:
+                # порядок ленты популярного изменился, её версии устарели
+                bump(POPULAR_SCOPE)
+            return total
+        _write_scores(rows)
+        total += len(rows)
+        last_pk = rows[-1][0]
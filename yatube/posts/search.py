@@ -0,0 +1,163 @@
+import math
+import re
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection
+
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+class FTS5Backend:
+    """Поиск по таблице SQLite FTS5, ранжирование по bm25."""
+
+    def search(self, query, limit):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        # каждое слово в кавычках, чтобы ввод не разбирался как синтаксис
+        match = ' '.join(f'"{term}"' for term in terms)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY rank LIMIT %s', [match, limit]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def index(self, pk, text):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [pk])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)',
+                [pk, text]
+            )
+
+    def remove(self, pk):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [pk])
+
+    def index_new(self):
+        """
+        Добирает посты, созданные в обход сигналов (bulk_create). Ищет
+        все отсутствующие в индексе, а не только выше последнего id:
+        из очереди задач индексация отдельных постов может прийти раньше.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, text) '
+                f'SELECT id, text FROM posts_post WHERE id NOT IN '
+                f'(SELECT rowid FROM {FTS_TABLE})'
+            )
+
+
+class InvertedIndexBackend:
+    """Обратный индекс в памяти процесса, ранжирование по TF-IDF."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._postings = None
+            self._documents = {}
+
+    def _build(self):
+        self._postings = defaultdict(dict)
+        self._documents = {}
+        posts = Post.objects.order_by().values_list('pk', 'text')
+        for pk, text in posts.iterator():
+            self._add(pk, text)
+
+    def _add(self, pk, text):
+        terms = tokenize(text)
+        self._documents[pk] = set(terms)
+        for term in terms:
+            self._postings[term][pk] = self._postings[term].get(pk, 0) + 1
+
+    def _discard(self, pk):
+        for term in self._documents.pop(pk, ()):
+            postings = self._postings[term]
+            postings.pop(pk, None)
+            if not postings:
+                del self._postings[term]
+
+    def search(self, query, limit):
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        with self._lock:
+            if self._postings is None:
+                self._build()
+            matches = [self._postings.get(term, {}) for term in terms]
+            total = len(self._documents)
+        if not all(matches):
+            return []
+        found = set.intersection(*(set(posting) for posting in matches))
+        scores = {
+            pk: sum(posting[pk] * math.log(1 + total / len(posting))
+                    for posting in matches)
+            for pk in found
+        }
+        return sorted(scores, key=lambda pk: (-scores[pk], -pk))[:limit]
+
+    def index(self, pk, text):
+        with self._lock:
+            if self._postings is not None:
+                self._discard(pk)
+                self._add(pk, text)
+
+    def remove(self, pk):
+        with self._lock:
+            if self._postings is not None:
+                self._discard(pk)
+
+    def index_new(self):
+        # id новых постов неизвестны: перестроим индекс при следующем поиске
+        self.reset()
+
+
+inverted_index = InvertedIndexBackend()
+fts5 = FTS5Backend()
+_fts5_databases = {}
+
+
+def fts5_available():
+    """Есть ли таблица FTS5: её создаёт миграция, если SQLite умеет."""
+    if connection.vendor != 'sqlite':
+        return False
+    name = connection.settings_dict['NAME']
+    if name not in _fts5_databases:
+        _fts5_databases[name] = (
+            FTS_TABLE in connection.introspection.table_names()
+        )
+    return _fts5_databases[name]
+
+
+def get_backend():
+    name = getattr(settings, 'POSTS_SEARCH_BACKEND', 'auto')
+    if name == 'fts5' or (name == 'auto' and fts5_available()):
+        return fts5
+    return inverted_index
+
+
+def active_backends():
+    """Индексы, которые надо обновлять при записи постов."""
+    if fts5_available():
+        return (fts5, inverted_index)
+    return (inverted_index,)
+
+
+def search_ids(query, limit=None):
+    """id постов по запросу, лучшие совпадения первыми."""
+    if limit is None:
+        limit = settings.POSTS_SEARCH_LIMIT
+    return get_backend().search(query, limit)
@@ -0,0 +1,139 @@
+from collections import Counter
+
+from django.db.models.signals import post_delete, post_init, post_save
+from django.contrib.auth import get_user_model
+from django.db.models.signals import pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import search, tasks, timeline
+from .caching import (GROUPS_SCOPE, INDEX_SCOPE, bump, group_scope,
+                      invalidate_posts, profile_scope)
+from .counters import change_counts
+from .models import Group, Post, bulk_created, popularity
+
+User = get_user_model()
+
+TRACKED_FIELDS = ('author_id', 'group_id')
+
+
+@receiver(post_init, sender=Post)
+def remember_keys(sender, instance, **kwargs):
+    # отложенные поля не трогаем, чтобы не делать лишний запрос
+    instance._saved_keys = {
+        field: instance.__dict__[field]
+        for field in TRACKED_FIELDS if field in instance.__dict__
+    }
+
+
+@receiver(pre_save, sender=Post)
+def fetch_saved_keys(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding:
+        return
+    missing = [field for field in TRACKED_FIELDS
+               if field not in instance._saved_keys]
+    if missing:
+        instance._saved_keys.update(
+            Post.objects.filter(pk=instance.pk).values(*missing).first()
+            or {}
+        )
+
+
+@receiver(pre_save, sender=Post)
+def set_initial_score(sender, instance, raw=False, **kwargs):
+    if raw or not instance._state.adding:
+        return
+    # pub_date проставит auto_now_add, он совпадёт с now до долей секунды
+    instance.score = popularity(instance.views,
+                                instance.pub_date or timezone.now())
+
+
+@receiver(post_save, sender=Post)
+def update_saved_post(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    # счётчики - число постов для пагинатора, они обновляются сразу;
+    # в очередь задач уходит только таблица поиска FTS5, если она есть
+    if created:
+        change_counts(authors={instance.author_id: 1},
+                      groups={instance.group_id: 1})
+    else:
+        saved = instance._saved_keys
+        if saved.get('author_id') != instance.author_id:
+            change_counts(authors=Counter({saved.get('author_id'): -1,
+                                           instance.author_id: 1}))
+        if saved.get('group_id') != instance.group_id:
+            change_counts(groups=Counter({saved.get('group_id'): -1,
+                                          instance.group_id: 1}))
+    update_fields = kwargs.get('update_fields')
+    if update_fields is None or 'text' in update_fields:
+        search.inverted_index.index(instance.pk, instance.text)
+        if search.fts5_available():
+            tasks.index_post.delay(instance.pk)
+    timeline.forget_items(instance.pk)
+    if created:
+        if instance.group_id is not None:
+            timeline.push(instance)
+    elif instance._saved_keys.get('group_id') != instance.group_id:
+        timeline.discard(instance._saved_keys.get('group_id'),
+                         instance.group_id)
+    invalidate_posts(
+        {instance.author_id, instance._saved_keys.get('author_id')},
+        {instance.group_id, instance._saved_keys.get('group_id')},
+        {instance.pk},
+    )
+    instance._saved_keys = {
+        field: getattr(instance, field) for field in TRACKED_FIELDS
+    }
+
+
+@receiver(post_delete, sender=Post)
+def update_deleted_post(sender, instance, **kwargs):
+    change_counts(authors={instance.author_id: -1},
+                  groups={instance.group_id: -1})
+    invalidate_posts({instance.author_id}, {instance.group_id},
+                     {instance.pk})
+    timeline.discard(instance.group_id)
+    timeline.forget_items(instance.pk)
+    search.inverted_index.remove(instance.pk)
+    if search.fts5_available():
+        tasks.remove_post.delay(instance.pk)
+
+
+@receiver(bulk_created, sender=Post)
+def update_bulk_created(sender, objs, **kwargs):
+    change_counts(authors=Counter(post.author_id for post in objs),
+                  groups=Counter(post.group_id for post in objs))
+    invalidate_posts({post.author_id for post in objs},
+                     {post.group_id for post in objs})
+    timeline.discard(*{post.group_id for post in objs})
+    search.inverted_index.index_new()
+    if search.fts5_available():
+        tasks.index_new_posts.delay()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def update_group(sender, instance, raw=False, **kwargs):
+    # название группы выводится в лентах и в форме поста, а при удалении
+    # у постов обнуляется group без сигналов
+    if not raw:
+        bump(INDEX_SCOPE, GROUPS_SCOPE, group_scope(instance.slug))
+        timeline.forget_group(instance.pk)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def update_user(sender, instance, raw=False, **kwargs):
+    # имя автора выводится на странице профиля, на главной и в лентах
+    # групп; посты удалённого автора сбрасываются своими сигналами
+    if raw:
+        return
+    bump(profile_scope(instance.username))
+    update_fields = kwargs.get('update_fields')
+    if kwargs.get('created') is False and (
+            update_fields is None or update_fields - {'last_login'}):
+        slugs = Group.objects.filter(
+            post__author=instance).values_list('slug', flat=True).distinct()
+        bump(INDEX_SCOPE, *(group_scope(slug) for slug in slugs))
+        timeline.forget_author(instance.pk)
@@ -0,0 +1,27 @@
+from core.tasks import task
+from . import search
+from .models import Post
+
+
+# в очередь уходит только таблица FTS5: индекс в памяти живёт
+# в процессе сайта и обновляется там же. Задачи не трогают кэш:
+# у воркера он свой, до процессов сайта сброс не дойдёт
+
+
+@task
+def index_post(pk):
+    text = Post.objects.filter(pk=pk).values_list('text', flat=True).first()
+    if text is not None and search.fts5_available():
+        search.fts5.index(pk, text)
+
+
+@task
+def remove_post(pk):
+    if search.fts5_available():
+        search.fts5.remove(pk)
+
+
+@task
+def index_new_posts():
+    if search.fts5_available():
+        search.fts5.index_new()
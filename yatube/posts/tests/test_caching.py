@@ -0,0 +1,71 @@
+import threading
+import time
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from posts import caching
+
+THREADS = 8
+
+
+class FetchTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+        self.calls_lock = threading.Lock()
+
+    def compute(self, value, delay=0.2):
+        def compute():
+            with self.calls_lock:
+                self.calls += 1
+            time.sleep(delay)
+            return value
+        return compute
+
+    def fetch_in_threads(self, compute):
+        barrier = threading.Barrier(THREADS)
+        results = []
+
+        def worker():
+            barrier.wait()
+            results.append(caching.fetch('hot', compute, 60))
+
+        threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_miss_is_computed_once(self):
+        """При промахе значение считает один поток, остальные ждут его."""
+        results = self.fetch_in_threads(self.compute('new'))
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, ['new'] * THREADS)
+
+    def test_stale_value_served_during_refresh(self):
+        """Пока идёт пересчёт, остальные получают устаревшее значение."""
+        cache.set('hot', ('old', time.time() - 1, 0.01), 60)
+        results = self.fetch_in_threads(self.compute('new'))
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results.count('new'), 1)
+        self.assertEqual(results.count('old'), THREADS - 1)
+        self.assertEqual(caching.fetch('hot', self.compute('other'), 60),
+                         'new')
+
+    def test_early_refresh(self):
+        """Дорогое значение обновляется заранее, дешёвое - нет."""
+        cache.set('hot', ('old', time.time() + 1, 0), 60)
+        self.assertEqual(caching.fetch('hot', self.compute('new', 0), 60),
+                         'old')
+        cache.set('hot', ('old', time.time() + 1, 1000), 60)
+        self.assertEqual(caching.fetch('hot', self.compute('new', 0), 60),
+                         'new')
+
+    def test_invalid_entry_is_not_served(self):
+        """Отбракованная запись не отдаётся даже как устаревшая."""
+        cache.set('hot', ('old', time.time() + 60, 0), 60)
+        value = caching.fetch('hot', self.compute('new', 0), 60,
+                              valid=lambda value: value != 'old')
+        self.assertEqual(value, 'new')
@@ -0,0 +1,101 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from posts import benchmark
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class TransferCommandsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmp_dir = tempfile.mkdtemp()
+        cls.author = User.objects.create_user(username='exporter')
+        cls.group = Group.objects.create(
+            title='Группа', slug='transfer', description='Описание')
+        cls.post = Post.objects.create(
+            text='С группой', author=cls.author, group=cls.group)
+        Post.objects.filter(pk=cls.post.pk).update(
+            pub_date=timezone.now() - timedelta(days=30))
+        Post.objects.create(text='Без группы, "с кавычками"',
+                            author=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(cls.tmp_dir, ignore_errors=True)
+
+    def roundtrip(self, fmt):
+        posts = os.path.join(self.tmp_dir, f'posts.{fmt}')
+        groups = os.path.join(self.tmp_dir, f'groups.{fmt}')
+        call_command('posts_export', posts, format=fmt, stderr=StringIO())
+        call_command('posts_export', groups, model='group', format=fmt,
+                     stderr=StringIO())
+        expected = list(Post.objects.values_list(
+            'text', 'pub_date', 'author__username', 'group__slug'))
+        Post.objects.all().delete()
+        Group.objects.all().delete()
+
+        call_command('posts_import', groups, model='group', format=fmt,
+                     stdout=StringIO())
+        out = StringIO()
+        call_command('posts_import', posts, format=fmt, batch_size=1,
+                     stdout=out)
+        self.assertIn('строк/с', out.getvalue())
+        self.assertEqual(
+            list(Post.objects.values_list(
+                'text', 'pub_date', 'author__username', 'group__slug')),
+            expected)
+        self.assertEqual(Group.objects.get().posts_count, 1)
+        self.author.profile.refresh_from_db()
+        self.assertEqual(self.author.profile.posts_count, 2)
+
+    def test_ndjson_roundtrip(self):
+        """Выгрузка и загрузка NDJSON сохраняют посты и даты."""
+        self.roundtrip('ndjson')
+
+    def test_csv_roundtrip(self):
+        """Выгрузка и загрузка CSV сохраняют посты и даты."""
+        self.roundtrip('csv')
+
+    def test_unknown_author_is_skipped(self):
+        """Посты неизвестных авторов пропускаются."""
+        path = os.path.join(self.tmp_dir, 'unknown.ndjson')
+        with open(path, 'w', encoding='utf-8') as stream:
+            stream.write('{"text": "Чужой", "pub_date": '
+                         '"2022-05-01T10:00:00+00:00", '
+                         '"author": "nobody", "group": null}\n')
+        out = StringIO()
+        call_command('posts_import', path, stdout=out)
+        self.assertIn('пропущено 1', out.getvalue())
+        self.assertFalse(Post.objects.filter(text='Чужой').exists())
+
+
+class BenchmarkTest(TestCase):
+    def test_seed_and_measure(self):
+        """Замер наполняет базу и отчитывается по каждой странице."""
+        benchmark.seed(posts=30, authors=3, groups=2)
+        self.assertEqual(Post.objects.count(), 30)
+        self.assertEqual(
+            sum(Group.objects.values_list('posts_count', flat=True)),
+            Post.objects.filter(group__isnull=False).count())
+        results = benchmark.run(requests=2)
+        self.assertEqual(
+            [result['view'] for result in results],
+            ['index', 'group_posts', 'profile', 'post_detail',
+             'post_create'])
+        for result in results:
+            with self.subTest(view=result['view']):
+                self.assertGreater(result['p99_ms'], 0)
+                self.assertGreaterEqual(result['p99_ms'], result['p50_ms'])
+                self.assertGreater(result['queries_per_request'], 0)
@@ -3,7 +3,9 @@ import shutil
 import tempfile
 from django.contrib.auth import get_user_model
 from django.conf import settings
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from posts.forms import PostForm
 from posts.models import Post, Group
@@ -171,3 +173,72 @@ class PostFormTests(TestCase):
             f'{AUTH_LOG_PAGE}{reverse("posts:post_create")}'
         )
         self.assertEqual(Post.objects.count(), post_count)
+
+
+class GroupChoicesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='choices')
+        cls.groups = [
+            Group.objects.create(title=f'Группа {i}', slug=f'choices-{i}')
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        self.authorized_author = Client()
+        self.authorized_author.force_login(self.user)
+        self.url = reverse('posts:post_create')
+
+    def group_queries(self, method, *args):
+        with CaptureQueriesContext(connection) as queries:
+            response = method(self.url, *args)
+        # запросы, читающие все группы подряд
+        return response, [query['sql'] for query in queries
+                          if 'FROM "posts_group"' in query['sql']
+                          and 'WHERE' not in query['sql']]
+
+    def test_choices_without_group_query(self):
+        """Форма выводит и проверяет группы, не читая их все из базы."""
+        self.authorized_author.get(self.url)
+        response, queries = self.group_queries(self.authorized_author.get)
+        self.assertEqual(queries, [])
+        self.assertFalse(response.context['form'].is_bound)
+        for group in self.groups:
+            self.assertContains(response, group.title)
+        response, queries = self.group_queries(
+            self.authorized_author.post,
+            {'text': 'Пост', 'group': self.groups[0].pk})
+        self.assertEqual(queries, [])
+        self.assertRedirects(
+            response, reverse('posts:profile', args=(self.user.username,)))
+
+    def test_group_changes_update_choices(self):
+        """Новая и удалённая группы сразу видны в форме."""
+        self.authorized_author.get(self.url)
+        new = Group.objects.create(title='Свежая группа', slug='fresh')
+        self.assertContains(self.authorized_author.get(self.url),
+                            new.title)
+        new.delete()
+        self.assertNotContains(self.authorized_author.get(self.url),
+                               new.title)
+
+    @override_settings(POSTS_GROUP_SELECT_LIMIT=1)
+    def test_lookup_widget_for_many_groups(self):
+        """При множестве групп в форме только выбранная и поиск."""
+        post = Post.objects.create(text='Пост', author=self.user,
+                                   group=self.groups[1])
+        response = self.authorized_author.get(
+            reverse('posts:post_edit', args=(post.pk,)))
+        self.assertContains(response, 'data-lookup-url')
+        self.assertContains(response, self.groups[1].title)
+        self.assertNotContains(response, self.groups[0].title)
+
+    def test_group_lookup(self):
+        """Поиск групп отдаёт JSON с подходящими группами."""
+        response = self.client.get(reverse('posts:group_lookup'),
+                                   {'q': 'Группа 2'})
+        self.assertEqual(response.json(), {
+            'results': [{'id': self.groups[2].pk, 'title': 'Группа 2'}],
+            'has_next': False,
+        })
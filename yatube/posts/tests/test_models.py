@@ -1,7 +1,17 @@
+import re
+from io import StringIO
+from unittest import skipUnless
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
 
 from ..models import Group, Post
+from ..utils import POPULAR_KEYS, KeysetPaginator
 
 User = get_user_model()
 
@@ -29,3 +39,109 @@ class PostModelTest(TestCase):
         expected_object_name = group.title
         self.assertEqual(expected_object_post, str(post))
         self.assertEqual(expected_object_name, str(group))
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN из SQLite')
+class PostFeedQueryPlanTest(TestCase):
+    FULL_SCAN = re.compile(r'^SCAN (TABLE )?posts_post$')
+
+    def query_plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def test_feed_queries_use_indexes(self):
+        """Запросы лент не сканируют таблицу и не сортируют во временном
+        B-дереве."""
+        seek = KeysetPaginator(Post.objects.all(), 10)._seek_filter(
+            [timezone.now(), 1], 'lt')
+        popular_paginator = KeysetPaginator(Post.objects.feed(), 10,
+                                            keys=POPULAR_KEYS)
+        popular = popular_paginator.object_list
+        popular_seek = popular_paginator._seek_filter([1.5, 1], 'lt')
+        feeds = {
+            'index': Post.objects.feed(),
+            'group': Post.objects.feed().filter(group_id=1),
+            'profile': Post.objects.feed().filter(author_id=1),
+            'index_seek': Post.objects.feed().filter(seek),
+            'group_seek': Post.objects.feed().filter(seek, group_id=1),
+            'profile_seek': Post.objects.feed().filter(seek, author_id=1),
+            'popular_seek': popular.filter(popular_seek),
+            'group_popular_seek': popular.filter(popular_seek, group_id=1),
+        }
+        for name, queryset in feeds.items():
+            with self.subTest(feed=name):
+                plan = self.query_plan(queryset[:11])
+                for step in plan:
+                    self.assertIsNone(self.FULL_SCAN.match(step), plan)
+                    self.assertNotIn('TEMP B-TREE', step, plan)
+
+
+class PostCountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='counter')
+        cls.group = Group.objects.create(title='Первая', slug='first')
+        cls.group_2 = Group.objects.create(title='Вторая', slug='second')
+
+    def assertCounts(self, author, group, group_2):
+        self.author.profile.refresh_from_db()
+        self.group.refresh_from_db()
+        self.group_2.refresh_from_db()
+        self.assertEqual(self.author.profile.posts_count, author)
+        self.assertEqual(self.group.posts_count, group)
+        self.assertEqual(self.group_2.posts_count, group_2)
+
+    def test_counters_follow_post_changes(self):
+        """Счётчики верны после создания, смены группы и удаления."""
+        post = Post.objects.create(text='Пост', author=self.author,
+                                   group=self.group)
+        Post.objects.bulk_create([
+            Post(text='Пакет', author=self.author, group=self.group_2),
+            Post(text='Пакет', author=self.author),
+        ])
+        self.assertCounts(3, 1, 1)
+
+        post = Post.objects.feed().get(pk=post.pk)
+        post.group = self.group_2
+        post.save()
+        self.assertCounts(3, 0, 2)
+
+        post = Post.objects.only('text').get(pk=post.pk)
+        post.group = None
+        post.save()
+        self.assertCounts(3, 0, 1)
+
+        post.delete()
+        self.assertCounts(2, 0, 1)
+
+    def test_cascade_delete_keeps_group_counter(self):
+        """Удаление автора вычитает его посты из счётчика группы."""
+        other = User.objects.create_user(username='cascade')
+        Post.objects.create(text='Пост', author=other, group=self.group)
+        Post.objects.create(text='Пост', author=self.author,
+                            group=self.group)
+        other.delete()
+        self.assertCounts(1, 1, 0)
+
+    def test_rebuild_command(self):
+        """Команда пересчёта восстанавливает счётчики с нуля."""
+        Post.objects.create(text='Пост', author=self.author,
+                            group=self.group)
+        self.author.profile.delete()
+        Group.objects.update(posts_count=7)
+        call_command('rebuild_post_counts', stdout=StringIO())
+        self.author = User.objects.get(pk=self.author.pk)
+        self.assertCounts(1, 1, 0)
+
+    def test_profile_without_aggregates(self):
+        """Страница профиля не выполняет COUNT(*)."""
+        Post.objects.create(text='Пост', author=self.author)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('posts:profile', args=(self.author.username,)))
+        self.assertContains(response, 'Всего постов: 1')
+        self.assertFalse(
+            any('COUNT(' in query['sql'] for query in queries))
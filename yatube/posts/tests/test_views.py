@@ -1,8 +1,20 @@
+import tempfile
+from unittest import mock
+from xml.etree import ElementTree
+
 from django import forms
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import OperationalError, connection
+from django.db.models import QuerySet
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from posts.models import Group, Post
+from posts import caching, hits, ranking, search, timeline
+from posts.models import Group, Post, popularity
+from posts.utils import FeedPaginator
 
 
 User = get_user_model()
@@ -191,3 +203,818 @@ class PaginatorViewsTest(TestCase):
         for tested_url in list_urls.keys():
             response = self.client.get(tested_url)
             self.assertEqual(len(response.context['page_obj']), 3)
+
+
+@override_settings(POSTS_PAGINATION='keyset')
+class KeysetPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='keyset')
+        Post.objects.bulk_create(
+            Post(text=f'Тестовый пост {i}', author=cls.author)
+            for i in range(25)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_pages_follow_cursors(self):
+        """Курсоры проходят ленту без пропусков и повторов."""
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        page_obj = response.context['page_obj']
+        self.assertIsInstance(page_obj.paginator, Paginator)
+        self.assertFalse(page_obj.has_previous())
+        seen = [post.pk for post in page_obj]
+        pages = [seen[:]]
+        while page_obj.has_next():
+            response = self.client.get(
+                url, {'cursor': page_obj.next_cursor})
+            page_obj = response.context['page_obj']
+            pages.append([post.pk for post in page_obj])
+            seen.extend(pages[-1])
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        expected = list(
+            Post.objects.order_by('-pub_date', '-id')
+            .values_list('pk', flat=True)
+        )
+        self.assertEqual(seen, expected)
+
+        response = self.client.get(
+            url, {'cursor': page_obj.previous_cursor})
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']], pages[1])
+
+    def test_broken_cursor_returns_first_page(self):
+        """Испорченный курсор открывает первую страницу."""
+        response = self.client.get(
+            reverse('posts:index'), {'cursor': 'garbage'})
+        self.assertEqual(len(response.context['page_obj']), 10)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+    def test_page_without_count_query(self):
+        """Страница курсорной ленты не выполняет COUNT(*)."""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('posts:index'))
+        self.assertFalse(
+            any('COUNT(' in query['sql'] for query in queries))
+
+
+class FeedQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='feed_author')
+        cls.group = Group.objects.create(title='Группа', slug='feed-group')
+        posts = []
+        for i in range(15):
+            author = User.objects.create_user(username=f'feed_{i}')
+            group = Group.objects.create(title=f'Группа {i}',
+                                         slug=f'feed-group-{i}')
+            posts.append(Post(text=f'Пост {i}', author=author, group=group))
+        posts.extend(
+            Post(text=f'Пост автора {i}', author=cls.author, group=cls.group)
+            for i in range(15)
+        )
+        Post.objects.bulk_create(posts)
+
+    def test_feed_query_count_is_fixed(self):
+        """Число запросов ленты не зависит от числа постов на странице."""
+        # страница и COUNT пагинатора; группа ищется отдельно, а её
+        # лента - id из индекса и посты по ним, число постов в счётчике;
+        # профиль берёт число постов из счётчика вместе с автором
+        urls_queries = {
+            reverse('posts:index'): 2,
+            reverse('posts:index') + '?page=2': 2,
+            reverse('posts:groups', kwargs={'slug': self.group.slug}): 3,
+            reverse('posts:profile',
+                    kwargs={'username': self.author.username}): 2,
+        }
+        for url, queries in urls_queries.items():
+            with self.subTest(url=url):
+                with self.assertNumQueries(queries):
+                    self.client.get(url)
+
+
+class FeedCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='cached')
+        cls.group = Group.objects.create(title='Старая', slug='old-group')
+        cls.group_2 = Group.objects.create(title='Новая', slug='new-group')
+        cls.other = Group.objects.create(title='Чужая', slug='other-group')
+        cls.post = Post.objects.create(text='Первый пост', author=cls.author,
+                                       group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.author)
+
+    def test_feed_fragment_served_from_cache(self):
+        """Повторный запрос ленты не читает посты из базы."""
+        url = reverse('posts:index')
+        first = self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(url)
+        self.assertEqual(first.content, second.content)
+        self.assertFalse(
+            any('posts_post"."text' in query['sql'] for query in queries))
+
+    def test_author_rename_invalidates_feeds(self):
+        """Новое имя автора сразу видно на главной и в ленте группы."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:groups', args=(self.group.slug,)),
+        )
+        for url in urls:
+            self.client.get(url)
+        other_scope = caching.group_scope(self.other.slug)
+        other_version = caching.scope_version(other_scope)
+        author = User.objects.get(pk=self.author.pk)
+        author.first_name = 'Переименованный'
+        author.save()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), 'Переименованный')
+        self.assertEqual(caching.scope_version(other_scope), other_version)
+
+    def test_create_invalidates_index_group_and_author(self):
+        """Новый пост сразу виден в ленте, группе и профиле."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:groups', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.author.username,)),
+        )
+        for url in urls:
+            self.client.get(url)
+        other_scope = caching.group_scope(self.other.slug)
+        other_version = caching.scope_version(other_scope)
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            {'text': 'Свежий пост', 'group': self.group.pk})
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), 'Свежий пост')
+        self.assertEqual(caching.scope_version(other_scope), other_version)
+
+    def test_edit_invalidates_old_and_new_group(self):
+        """Правка поста сбрасывает кэш старой и новой группы."""
+        old_url = reverse('posts:groups', args=(self.group.slug,))
+        new_url = reverse('posts:groups', args=(self.group_2.slug,))
+        self.client.get(old_url)
+        self.client.get(new_url)
+        self.authorized_client.post(
+            reverse('posts:post_edit', args=(self.post.pk,)),
+            {'text': 'Исправленный пост', 'group': self.group_2.pk})
+        self.assertContains(self.client.get(new_url), 'Исправленный пост')
+        self.assertNotContains(self.client.get(old_url), 'Первый пост')
+
+
+@override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': tempfile.gettempdir() + '/yatube-test-cache',
+}})
+class FileFeedCacheTest(FeedCacheTest):
+    pass
+
+
+# таблица FTS5 пополняется из очереди задач, здесь - сразу
+@override_settings(TASKS_EAGER=True)
+class SearchViewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_superuser(
+            username='searcher', email='s@mail.ru', password='pass')
+        cls.once = Post.objects.create(
+            author=cls.author, text='Котики и собаки')
+        cls.twice = Post.objects.create(
+            author=cls.author, text='Котики, котики и ещё раз котики')
+        Post.objects.create(author=cls.author, text='Про погоду')
+
+    def setUp(self):
+        search.inverted_index.reset()
+
+    def found(self, query):
+        response = self.client.get(reverse('posts:search'), {'q': query})
+        return [post.pk for post in response.context['page_obj']]
+
+    def test_results_are_ranked(self):
+        """Поиск находит посты и ставит лучшие совпадения первыми."""
+        self.assertEqual(self.found('котики'), [self.twice.pk, self.once.pk])
+        self.assertEqual(self.found('котики собаки'), [self.once.pk])
+        self.assertEqual(self.found('"котики*'),
+                         [self.twice.pk, self.once.pk])
+        self.assertEqual(self.found('слоны'), [])
+
+    def test_index_follows_post_changes(self):
+        """Индекс обновляется при создании, правке и удалении поста."""
+        self.found('котики')
+        post = Post.objects.create(author=self.author, text='Слоны')
+        self.assertEqual(self.found('слоны'), [post.pk])
+        post.text = 'Жирафы'
+        post.save()
+        self.assertEqual(self.found('слоны'), [])
+        self.assertEqual(self.found('жирафы'), [post.pk])
+        post.delete()
+        self.assertEqual(self.found('жирафы'), [])
+        Post.objects.bulk_create([Post(author=self.author, text='Слоны')])
+        self.assertEqual(len(self.found('слоны')), 1)
+
+    def test_results_are_paginated(self):
+        """Результаты поиска делятся на страницы."""
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Зебры {i}') for i in range(13))
+        response = self.client.get(
+            reverse('posts:search'), {'q': 'зебры', 'page': 2})
+        self.assertEqual(len(response.context['page_obj']), 3)
+        self.assertContains(response, '?q=%D0%B7%D0%B5%D0%B1%D1%80%D1%8B&')
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт через поисковый индекс."""
+        self.client.force_login(self.author)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'собаки'})
+        self.assertEqual(
+            [post.pk for post in response.context['cl'].result_list],
+            [self.once.pk])
+
+
+@override_settings(POSTS_SEARCH_BACKEND='python')
+class InvertedIndexSearchViewTest(SearchViewTest):
+    pass
+
+
+@override_settings(POSTS_PAGE_CACHE=False)
+class PostDetailCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='detail')
+        cls.group = Group.objects.create(title='Группа', slug='detail')
+        cls.post = Post.objects.create(text='Исходный текст',
+                                       author=cls.author, group=cls.group)
+        cls.url = reverse('posts:post_detail', args=(cls.post.pk,))
+
+    def setUp(self):
+        cache.clear()
+        # просмотры прошлых тестов не должны записаться посреди замера
+        hits.discard()
+
+    def test_single_query_then_cache(self):
+        """Пост читается одним запросом, повтор обходится без базы."""
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'Всего постов автора: 1')
+        with self.assertNumQueries(0):
+            cached = self.client.get(self.url)
+        self.assertEqual(response.content, cached.content)
+        self.assertEqual(cached.context['post'], self.post)
+
+    def test_edit_evicts_page(self):
+        """Правка поста сразу видна на его странице."""
+        self.client.get(self.url)
+        author_client = Client()
+        author_client.force_login(self.author)
+        author_client.post(
+            reverse('posts:post_edit', args=(self.post.pk,)),
+            {'text': 'Новый текст', 'group': self.group.pk})
+        self.assertContains(self.client.get(self.url), 'Новый текст')
+
+    def test_group_rename_and_delete_reach_post(self):
+        """Переименование и удаление группы сразу видны на странице поста."""
+        etag = self.client.get(self.url)['ETag']
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Новое название'
+        group.slug = 'renamed'
+        group.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Новое название')
+        self.assertContains(response, reverse('posts:groups',
+                                              args=('renamed',)))
+        group.delete()
+        self.assertNotContains(self.client.get(self.url), 'Новое название')
+
+    def test_new_post_updates_author_count(self):
+        """Новый пост автора обновляет счётчик на страницах его постов."""
+        self.client.get(self.url)
+        Post.objects.create(text='Ещё пост', author=self.author)
+        self.assertContains(self.client.get(self.url),
+                            'Всего постов автора: 2')
+
+
+class PostViewsCounterTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='views')
+        cls.posts = [Post.objects.create(text=f'Пост {i}', author=cls.author)
+                     for i in range(2)]
+
+    def setUp(self):
+        cache.clear()
+        hits.discard()
+
+    def get(self, post, **headers):
+        return self.client.get(
+            reverse('posts:post_detail', args=(post.pk,)), **headers)
+
+    def views(self):
+        return list(Post.objects.order_by('pk').values_list('views',
+                                                            flat=True))
+
+    @override_settings(POSTS_VIEWS_FLUSH_HITS=5)
+    def test_views_flushed_in_batch(self):
+        """Просмотры копятся и пишутся одним запросом, с кэша тоже."""
+        first, second = self.posts
+        etag = self.get(first)['ETag']
+        self.get(first)
+        self.get(first, HTTP_IF_NONE_MATCH=etag)
+        self.get(second)
+        self.assertEqual(self.views(), [0, 0])
+        with CaptureQueriesContext(connection) as queries:
+            self.get(second)
+        updates = [query['sql'] for query in queries
+                   if query['sql'].startswith('UPDATE')]
+        # одно обновление просмотров и одно - рейтинга
+        self.assertEqual(len(updates), 2)
+        self.assertEqual(self.views(), [3, 2])
+        first.refresh_from_db()
+        self.assertEqual(first.score, popularity(3, first.pub_date))
+
+    @override_settings(POSTS_VIEWS_FLUSH_HITS=1)
+    def test_failed_flush_keeps_page_and_hits(self):
+        """Сбой записи просмотров не ломает страницу и не теряет их."""
+        first, second = self.posts
+        error = OperationalError('database is locked')
+        with self.assertLogs('yatube.hits', 'WARNING'):
+            with mock.patch.object(QuerySet, 'update', side_effect=error):
+                response = self.get(first)
+        self.assertEqual(response.status_code, 200)
+        with self.assertLogs('yatube.hits', 'WARNING'):
+            with mock.patch.object(ranking, 'rescore', side_effect=error):
+                self.assertEqual(self.get(second).status_code, 200)
+        # первый просмотр дописался со вторым, второй не задвоился
+        self.assertEqual(self.views(), [1, 1])
+
+    def test_hits_stay_with_their_database(self):
+        """Просмотры не пишутся в базу, ставшую default после них."""
+        self.get(self.posts[0])
+        with mock.patch.object(hits, '_database', return_value='other'):
+            self.assertEqual(hits.flush(), 0)
+        self.assertEqual(self.views(), [0, 0])
+
+    def test_missing_post_not_counted(self):
+        """Несуществующий пост просмотров не получает."""
+        self.client.get(reverse('posts:post_detail', args=(0,)))
+        self.assertEqual(hits.flush(), 0)
+
+
+class PopularFeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='popular')
+        cls.group = Group.objects.create(title='Группа', slug='popular')
+        cls.posts = [Post.objects.create(text=f'Пост {i}', author=cls.author,
+                                         group=cls.group)
+                     for i in range(13)]
+        Post.objects.create(text='Пост без группы', author=cls.author)
+        # старый пост с просмотрами обгоняет свежие
+        Post.objects.filter(pk=cls.posts[0].pk).update(views=1000)
+        ranking.rescore([cls.posts[0].pk])
+
+    def setUp(self):
+        cache.clear()
+
+    def texts(self, response):
+        return [post.text for post in response.context['page_obj']]
+
+    def test_popular_order(self):
+        """Популярное - по рейтингу, обычная лента - по дате."""
+        url = reverse('posts:index')
+        self.assertEqual(self.texts(self.client.get(url))[0],
+                         'Пост без группы')
+        popular = self.texts(self.client.get(url, {'sort': 'popular'}))
+        self.assertEqual(popular[:2], ['Пост 0', 'Пост без группы'])
+
+    def test_rescore_changes_etag(self):
+        """Пересчёт рейтинга меняет ETag и страницу популярного."""
+        url = reverse('posts:index')
+        etag = self.client.get(url, {'sort': 'popular'})['ETag']
+        latest = self.client.get(url)['ETag']
+        Post.objects.filter(pk=self.posts[5].pk).update(views=10 ** 6)
+        ranking.rescore([self.posts[5].pk])
+        response = self.client.get(url, {'sort': 'popular'},
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.texts(response)[0], 'Пост 5')
+        # хронологической ленты пересчёт не касается
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=latest).status_code, 304)
+
+    def test_new_post_is_scored(self):
+        """Новый пост сразу получает рейтинг выше старых без просмотров."""
+        self.assertGreater(Post.objects.get(text='Пост без группы').score,
+                           self.posts[1].score)
+
+    def test_cursor_keeps_sort(self):
+        """Ссылки на страницы сохраняют режим, посты не повторяются."""
+        url = reverse('posts:groups', args=(self.group.slug,))
+        response = self.client.get(url, {'sort': 'popular'})
+        page_obj = response.context['page_obj']
+        self.assertContains(response, 'sort=popular&amp;cursor=')
+        rest = self.client.get(url, {'sort': 'popular',
+                                     'cursor': page_obj.next_cursor})
+        seen = self.texts(response) + self.texts(rest)
+        self.assertEqual(len(seen), 13)
+        self.assertEqual(set(seen), {post.text for post in self.posts})
+        self.assertEqual(seen[0], 'Пост 0')
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='etag')
+        cls.group = Group.objects.create(title='Группа', slug='etag')
+        cls.post = Post.objects.create(text='Пост', author=cls.author,
+                                       group=cls.group)
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:groups', args=(cls.group.slug,)),
+            reverse('posts:profile', args=(cls.author.username,)),
+            reverse('posts:post_detail', args=(cls.post.pk,)),
+        )
+
+    def setUp(self):
+        cache.clear()
+        hits.discard()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def test_author_rename_changes_etag(self):
+        """После смены имени автора старый ETag лент не даёт 304."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:groups', args=(self.group.slug,)),
+            reverse('posts:feed', args=('atom',)),
+        )
+        etags = {url: self.client.get(url)['ETag'] for url in urls}
+        author = User.objects.get(pk=self.author.pk)
+        author.first_name = 'Переименованный'
+        author.save()
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=etags[url])
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('Переименованный',
+                              response.getvalue().decode())
+
+    def test_not_modified(self):
+        """Повторный запрос с ETag или датой получает 304 без тела."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                etag = response['ETag']
+                modified = response['Last-Modified']
+                for headers in ({'HTTP_IF_NONE_MATCH': etag},
+                                {'HTTP_IF_MODIFIED_SINCE': modified}):
+                    not_modified = self.client.get(url, **headers)
+                    self.assertEqual(not_modified.status_code, 304)
+                    self.assertEqual(not_modified.content, b'')
+
+    def test_etag_changes_after_edit(self):
+        """Правка поста меняет ETag всех страниц, где он показан."""
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls}
+        self.author_client.post(
+            reverse('posts:post_edit', args=(self.post.pk,)),
+            {'text': 'Правка', 'group': self.group.pk})
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Правка')
+
+    def test_etag_depends_on_user(self):
+        """Гость и автор получают разные ETag одной страницы."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertNotEqual(self.client.get(url)['ETag'],
+                                    self.author_client.get(url)['ETag'])
+
+    def test_edit_sets_updated_at(self):
+        """Правка меняет updated_at, но не дату публикации."""
+        pub_date, updated_at = self.post.pub_date, self.post.updated_at
+        self.post.text = 'Правка'
+        self.post.save()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.pub_date, pub_date)
+        self.assertGreater(self.post.updated_at, updated_at)
+
+
+class GuestPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='guest_page')
+        cls.group = Group.objects.create(title='Группа', slug='guest-page')
+        cls.post = Post.objects.create(text='Пост', author=cls.author,
+                                       group=cls.group)
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:index') + '?page=1',
+            reverse('posts:groups', args=(cls.group.slug,)),
+            reverse('posts:profile', args=(cls.author.username,)),
+            reverse('posts:post_detail', args=(cls.post.pk,)),
+        )
+
+    def setUp(self):
+        cache.clear()
+        hits.discard()
+
+    def test_guest_page_without_queries(self):
+        """Повторная страница для гостя отдаётся без обращений к базе."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                first = self.client.get(url)
+                with self.assertNumQueries(0):
+                    second = self.client.get(url)
+                self.assertEqual(first.content, second.content)
+
+    def test_guest_gets_no_cookies(self):
+        """Гостю не выдаются cookie сессии и CSRF, сессии не создаются."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertFalse(self.client.get(url).cookies)
+        self.assertFalse(Session.objects.exists())
+
+    def test_user_bypasses_cache(self):
+        """Вошедший пользователь получает свою страницу, не гостевую."""
+        author_client = Client()
+        author_client.force_login(self.author)
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.client.get(url)
+                response = author_client.get(url)
+                self.assertIsNotNone(response.context)
+                self.assertContains(response, 'Выйти')
+
+    def test_write_evicts_guest_page(self):
+        """Новый пост сразу виден гостю."""
+        url = reverse('posts:index')
+        self.client.get(url)
+        Post.objects.create(text='Свежий пост', author=self.author)
+        self.assertContains(self.client.get(url), 'Свежий пост')
+
+
+class PostAdminTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@mail.ru', password='pass')
+        cls.group = Group.objects.create(title='Группа', slug='admin')
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=cls.admin, group=cls.group)
+            for i in range(5)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def test_changelist_queries(self):
+        """Список постов без N+1 и без подсчёта всей таблицы."""
+        url = reverse('admin:posts_post_changelist')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['cl'].result_count, 5)
+        sql = [query['sql'] for query in queries]
+        self.assertFalse([query for query in sql if 'COUNT(' in query])
+        # кроме пользователя сессии авторы и группы отдельно не читаются
+        self.assertFalse([query for query in sql
+                          if query.startswith('SELECT "posts_group"')])
+        self.assertEqual(len([query for query in sql
+                              if query.startswith('SELECT "auth_user"')]),
+                         1)
+
+    def test_autocomplete_widgets(self):
+        """Автор и группа выбираются через автодополнение."""
+        response = self.client.get(reverse('admin:posts_post_add'))
+        for url in (reverse('admin:auth_user_autocomplete'),
+                    reverse('admin:posts_group_autocomplete')):
+            self.assertContains(response, f'data-ajax--url="{url}"')
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'))
+        self.assertContains(
+            response, reverse('admin:posts_group_autocomplete'))
+
+
+class SyndicationFeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='syndicated',
+                                              first_name='Лев')
+        cls.group = Group.objects.create(title='Новости', slug='news')
+        cls.post = Post.objects.create(text='Пост в группе',
+                                       author=cls.author, group=cls.group)
+        Post.objects.create(text='Пост без группы', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def urls(self, fmt):
+        return (
+            reverse('posts:feed', args=(fmt,)),
+            reverse('posts:group_feed', args=(self.group.slug, fmt)),
+            reverse('posts:profile_feed', args=(self.author.username, fmt)),
+        )
+
+    def entries(self, response):
+        root = ElementTree.fromstring(b''.join(response.streaming_content))
+        atom = '{http://www.w3.org/2005/Atom}'
+        return [item.find('description').text for item in root.iter('item')
+                ] + [entry.find(f'{atom}summary').text
+                     for entry in root.iter(f'{atom}entry')]
+
+    def test_feeds_stream_posts(self):
+        """Ленты RSS и Atom отдаются потоком и содержат посты области."""
+        for fmt, content_type in (('rss', 'application/rss+xml'),
+                                  ('atom', 'application/atom+xml')):
+            index, group, profile = self.urls(fmt)
+            with self.subTest(fmt=fmt):
+                response = self.client.get(index)
+                self.assertTrue(response.streaming)
+                self.assertTrue(response['Content-Type'].startswith(
+                    content_type))
+                self.assertIn('Пост без группы', self.entries(response))
+                self.assertEqual(self.entries(self.client.get(group)),
+                                 ['Пост в группе'])
+                self.assertEqual(len(self.entries(self.client.get(profile))),
+                                 2)
+
+    def test_unchanged_feed_without_queries(self):
+        """Неизменившаяся лента отвечает 304 без запросов к базе."""
+        for url in self.urls('atom'):
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                with self.assertNumQueries(0):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+    def test_new_post_changes_feed(self):
+        """Новый пост меняет ETag ленты."""
+        url = reverse('posts:group_feed', args=(self.group.slug, 'rss'))
+        etag = self.client.get(url)['ETag']
+        Post.objects.create(text='Свежий пост', author=self.author,
+                            group=self.group)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Свежий пост', self.entries(response))
+
+    def test_unknown_format_and_group(self):
+        """Неизвестный формат и группа дают 404."""
+        self.assertEqual(self.client.get('/feed.json').status_code, 404)
+        self.assertEqual(
+            self.client.get(
+                reverse('posts:group_feed', args=('nope', 'rss'))
+            ).status_code, 404)
+
+
+class GroupTimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='timeline')
+        cls.group = Group.objects.create(title='Лента', slug='timeline')
+        cls.other = Group.objects.create(title='Чужая', slug='other')
+        for i in range(25):
+            Post.objects.create(text=f'Пост группы {i}', author=cls.author,
+                                group=cls.group)
+        Post.objects.create(text='Пост чужой группы', author=cls.author,
+                            group=cls.other)
+        cls.url = reverse('posts:groups', args=(cls.group.slug,))
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def page_texts(self, page=1):
+        response = self.author_client.get(self.url, {'page': page})
+        return [post.text for post in response.context['page_obj']]
+
+    def expected_texts(self, page=1):
+        posts = Post.objects.filter(group=self.group)
+        return [post.text for post in posts[(page - 1) * 10:page * 10]]
+
+    def test_only_group_posts(self):
+        """В ленте группы только её посты и верное число страниц."""
+        response = self.author_client.get(self.url)
+        self.assertEqual(response.context['page_obj'].paginator.num_pages,
+                         3)
+        self.assertNotContains(response, 'Пост чужой группы')
+        for page in (1, 2, 3):
+            with self.subTest(page=page):
+                self.assertEqual(self.page_texts(page),
+                                 self.expected_texts(page))
+
+    def test_renames_reach_cached_posts(self):
+        """Новое имя автора и группы видно в постах из кэша ленты."""
+        self.page_texts()
+        self.author.first_name = 'Переименованный'
+        self.author.save()
+        self.assertContains(self.author_client.get(self.url),
+                            'Переименованный')
+        self.group.title = 'Новое название'
+        self.group.save()
+        ids = timeline.group_timeline(self.group.pk)[:10]
+        self.assertEqual({post.group.title
+                          for post in timeline.cached_items(ids)},
+                         {'Новое название'})
+
+    def test_first_pages_without_posts_table(self):
+        """Повторно первые страницы собираются без запросов к постам."""
+        self.page_texts()
+        with CaptureQueriesContext(connection) as queries:
+            self.page_texts()
+        self.assertFalse(
+            [query for query in queries if 'posts_post' in query['sql']])
+
+    def test_new_post_is_pushed(self):
+        """Новый пост попадает в начало закэшированной ленты."""
+        self.page_texts()
+        Post.objects.create(text='Свежий пост', author=self.author,
+                            group=self.group)
+        self.assertEqual(self.page_texts()[0], 'Свежий пост')
+        self.assertEqual(self.page_texts(), self.expected_texts())
+
+    def test_moved_post_leaves_timeline(self):
+        """Пост, перенесённый в другую группу, пропадает из ленты."""
+        self.page_texts()
+        post = Post.objects.filter(group=self.group).first()
+        post.group = self.other
+        post.save()
+        self.assertNotIn(post.text, self.page_texts())
+        self.assertEqual(self.page_texts(), self.expected_texts())
+
+    @override_settings(POSTS_TIMELINE_SIZE=10)
+    def test_far_pages_from_database(self):
+        """Страницы дальше кэшированной ленты читаются из базы."""
+        self.assertEqual(self.page_texts(1), self.expected_texts(1))
+        self.assertEqual(self.page_texts(3), self.expected_texts(3))
+
+
+class PageWindowTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='window')
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=author) for i in range(200))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_page_window(self):
+        """Окно страниц: края, соседи текущей и многоточия."""
+        paginator = FeedPaginator(range(1000), 10)
+        ellipsis = paginator.ELLIPSIS
+        windows = {
+            1: [1, 2, 3, ellipsis, 100],
+            5: [1, 2, 3, 4, 5, 6, 7, ellipsis, 100],
+            50: [1, ellipsis, 48, 49, 50, 51, 52, ellipsis, 100],
+            100: [1, ellipsis, 98, 99, 100],
+        }
+        for number, expected in windows.items():
+            with self.subTest(number=number):
+                self.assertEqual(paginator.page_window(number), expected)
+        self.assertEqual(FeedPaginator(range(30), 10).page_window(2),
+                         [1, 2, 3])
+
+    def test_paginator_renders_window(self):
+        """Полоса страниц не выводит ссылку на каждую страницу."""
+        response = self.client.get(reverse('posts:index'), {'page': 10})
+        content = response.content.decode()
+        # 1, 8, 9, 11, 12, 20 и четыре ссылки навигации
+        self.assertEqual(content.count('page-link" href="?page='), 10)
+        self.assertIn('…', content)
+
+    @override_settings(POSTS_COUNT_MODE='estimated')
+    def test_estimated_count_is_cached(self):
+        """В режиме оценки COUNT(*) не выполняется на каждый запрос."""
+        self.client.get(reverse('posts:index'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index'), {'page': 2})
+        self.assertEqual(response.context['page_obj'].paginator.count, 200)
+        self.assertFalse(
+            any('COUNT(' in query['sql'] for query in queries))
@@ -0,0 +1,110 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Post
+
+TIMELINE_KEY = 'posts:timeline:{}'
+ITEM_KEY = 'posts:item:{}'
+# сколько держится блокировка при добавлении id в ленту группы
+LOCK_TIMEOUT = 5
+
+
+def group_timeline(group_id):
+    """
+    id последних POSTS_TIMELINE_SIZE постов группы в порядке ленты.
+    Список живёт в кэше и дополняется при создании постов; после
+    сброса он заново читается из индекса (group, pub_date).
+    """
+    key = TIMELINE_KEY.format(group_id)
+    ids = cache.get(key)
+    if ids is None:
+        ids = list(Post.objects.filter(group_id=group_id)
+                   .values_list('pk', flat=True)
+                   [:settings.POSTS_TIMELINE_SIZE])
+        # add: не затираем id, добавленный параллельной записью
+        cache.add(key, ids, settings.POSTS_FEED_CACHE_TIMEOUT)
+    return ids
+
+
+def push(post):
+    """Ставит новый пост в начало ленты его группы."""
+    key = TIMELINE_KEY.format(post.group_id)
+    lock = f'{key}:lock'
+    if not cache.add(lock, True, LOCK_TIMEOUT):
+        # ленту правит другой запрос: проще перечитать её потом
+        cache.delete(key)
+        return
+    try:
+        ids = cache.get(key)
+        if ids is not None:
+            ids = [post.pk, *ids][:settings.POSTS_TIMELINE_SIZE]
+            cache.set(key, ids, settings.POSTS_FEED_CACHE_TIMEOUT)
+    finally:
+        cache.delete(lock)
+
+
+def discard(*group_ids):
+    """Сбрасывает ленты групп, где пост пропал или сменил место."""
+    cache.delete_many([TIMELINE_KEY.format(group_id)
+                       for group_id in group_ids if group_id is not None])
+
+
+def forget_items(*post_ids):
+    cache.delete_many([ITEM_KEY.format(pk) for pk in post_ids])
+
+
+def forget_group(group_id):
+    """
+    Сбрасывает ленту группы и посты из неё: в них закэшированы название
+    и slug группы. После удаления группы посты находятся только по ленте.
+    """
+    ids = list(cache.get(TIMELINE_KEY.format(group_id)) or ())
+    ids.extend(Post.objects.filter(group_id=group_id)
+               .values_list('pk', flat=True)[:settings.POSTS_TIMELINE_SIZE])
+    forget_items(*ids)
+    discard(group_id)
+
+
+def forget_author(author_id):
+    """Сбрасывает закэшированные посты автора из лент групп."""
+    forget_items(*Post.objects.filter(
+        author_id=author_id, group__isnull=False
+    ).values_list('pk', flat=True))
+
+
+def cached_items(ids):
+    """Посты для ленты по id из кэша объектов; недостающие - одним запросом."""
+    keys = {pk: ITEM_KEY.format(pk) for pk in ids}
+    found = cache.get_many(keys.values())
+    missing = [pk for pk in ids if keys[pk] not in found]
+    if missing:
+        fetched = Post.objects.feed().in_bulk(missing)
+        cache.set_many({keys[pk]: post for pk, post in fetched.items()},
+                       settings.POSTS_FEED_CACHE_TIMEOUT)
+        found.update((keys[pk], post) for pk, post in fetched.items())
+    return [found[keys[pk]] for pk in ids if keys[pk] in found]
+
+
+class GroupTimeline:
+    """
+    Посты группы как последовательность для пагинатора: страницы в
+    пределах ленты из кэша собираются без запросов к таблице постов,
+    дальние страницы читаются из queryset.
+    """
+
+    def __init__(self, group, queryset):
+        self.group = group
+        self.queryset = queryset
+
+    def __len__(self):
+        return self.group.posts_count
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        ids = group_timeline(self.group.pk)
+        # короткая лента - это все посты группы
+        complete = len(ids) < settings.POSTS_TIMELINE_SIZE
+        if complete or (index.stop is not None and index.stop <= len(ids)):
+            return cached_items(ids[index])
+        return list(self.queryset[index])
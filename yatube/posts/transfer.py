@@ -0,0 +1,116 @@
+import csv
+import json
+from contextlib import contextmanager
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.utils.dateparse import parse_datetime
+
+from .models import Group, Post
+
+User = get_user_model()
+
+# авторы и группы передаются естественными ключами: username и slug
+FIELDS = {
+    'post': ('text', 'pub_date', 'author', 'group'),
+    'group': ('title', 'slug', 'description'),
+}
+FORMATS = ('ndjson', 'csv')
+
+
+def export_rows(model, chunk_size):
+    """Строки для выгрузки; queryset читается порциями через iterator()."""
+    if model == 'group':
+        queryset = Group.objects.order_by('pk').values_list(*FIELDS[model])
+    else:
+        queryset = Post.objects.order_by('pk').values_list(
+            'text', 'pub_date', 'author__username', 'group__slug')
+    for row in queryset.iterator(chunk_size=chunk_size):
+        record = dict(zip(FIELDS[model], row))
+        if model == 'post':
+            record['pub_date'] = record['pub_date'].isoformat()
+        yield record
+
+
+def write_rows(rows, stream, fmt, model):
+    if fmt == 'csv':
+        writer = csv.DictWriter(stream, fieldnames=FIELDS[model])
+        writer.writeheader()
+        writer.writerows(rows)
+        return
+    for record in rows:
+        stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+def read_rows(stream, fmt):
+    if fmt == 'csv':
+        for record in csv.DictReader(stream):
+            # в CSV нет NULL: пустая группа означает пост без группы
+            if 'group' in record:
+                record['group'] = record['group'] or None
+            yield record
+        return
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+@contextmanager
+def keep_pub_date():
+    """Не даёт auto_now_add затереть дату публикации при загрузке."""
+    field = Post._meta.get_field('pub_date')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def _post_batch(records):
+    usernames = {record['author'] for record in records}
+    slugs = {record['group'] for record in records if record['group']}
+    authors = dict(User.objects.filter(username__in=usernames)
+                   .values_list('username', 'pk'))
+    groups = dict(Group.objects.filter(slug__in=slugs)
+                  .values_list('slug', 'pk'))
+    posts = []
+    for record in records:
+        if record['author'] not in authors:
+            continue
+        if record['group'] and record['group'] not in groups:
+            continue
+        posts.append(Post(
+            text=record['text'],
+            pub_date=parse_datetime(record['pub_date']),
+            author_id=authors[record['author']],
+            group_id=groups.get(record['group']),
+        ))
+    with keep_pub_date():
+        Post.objects.bulk_create(posts)
+    return len(posts)
+
+
+def _group_batch(records):
+    groups = [Group(**{field: record[field] for field in FIELDS['group']})
+              for record in records]
+    existing = set(Group.objects.filter(
+        slug__in=[group.slug for group in groups]
+    ).values_list('slug', flat=True))
+    groups = [group for group in groups if group.slug not in existing]
+    Group.objects.bulk_create(groups)
+    return len(groups)
+
+
+def import_rows(model, rows, batch_size):
+    """
+    Загружает строки пачками через bulk_create. Для каждой пачки отдаёт
+    пару (прочитано, записано); строки с неизвестным автором или группой
+    и уже существующие группы пропускаются.
+    """
+    save_batch = _group_batch if model == 'group' else _post_batch
+    rows = iter(rows)
+    while True:
+        records = list(islice(rows, batch_size))
+        if not records:
+            return
+        yield len(records), save_batch(records)
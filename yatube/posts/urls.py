@@ -1,13 +1,33 @@
 # posts/urls.py
-from django.urls import path
+from django.urls import path, register_converter
 from . import views
 
+
+class FeedFormatConverter:
+    regex = 'rss|atom'
+
+    def to_python(self, value):
+        return value
+
+    def to_url(self, value):
+        return value
+
+
+register_converter(FeedFormatConverter, 'feed')
+
 app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('feed.<feed:fmt>', views.index_feed, name='feed'),
     path('group/<slug:slug>/', views.group_posts, name='groups'),
+    path('group/<slug:slug>/feed.<feed:fmt>', views.group_feed,
+         name='group_feed'),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path('profile/<str:username>/feed.<feed:fmt>', views.profile_feed,
+         name='profile_feed'),
+    path('search/', views.search_posts, name='search'),
+    path('groups/lookup/', views.group_lookup, name='group_lookup'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit')
@@ -1,10 +1,261 @@
-from django.core.paginator import Paginator
+import base64
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
 
 COUNT = 10
+KEYSET_KEYS = ('pub_date', 'id')
+# лента популярного: по рейтингу из posts.ranking
+POPULAR_KEYS = ('score', 'id')
+
+
+def encode_cursor(direction, values):
+    """Упаковывает направление и значения ключа в непрозрачный токен."""
+    payload = json.dumps({
+        'd': direction,
+        'k': [v.isoformat() if hasattr(v, 'isoformat') else v
+              for v in values],
+    })
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Распаковывает токен курсора, для битого токена возвращает None."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        direction, values = payload['d'], payload['k']
+    except (ValueError, TypeError, KeyError):
+        return None
+    if direction not in ('next', 'prev') or not isinstance(values, list):
+        return None
+    return direction, values
+
+
+class KeysetPage(Page):
+    """Страница курсорной пагинации, совместимая с Page."""
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        super().__init__(object_list, None, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return '<Keyset page>'
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        return self.paginator.cursor_for('next', self.object_list[-1])
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        return self.paginator.cursor_for('prev', self.object_list[0])
+
+
+class KeysetPaginator(Paginator):
+    """
+    Пагинация по ключу (seek): страница выбирается условием по ключам
+    сортировки, а не OFFSET, и не требует COUNT(*). Стоимость страницы
+    не зависит от её глубины. Все ключи сортируются по убыванию.
+    """
+    keyset = True
+
+    def __init__(self, object_list, per_page, keys=KEYSET_KEYS):
+        self.keys = keys
+        object_list = object_list.order_by(*(f'-{key}' for key in keys))
+        super().__init__(object_list, per_page)
+
+    def cursor_for(self, direction, obj):
+        return encode_cursor(
+            direction, [getattr(obj, key) for key in self.keys]
+        )
+
+    def _seek_filter(self, values, lookup):
+        """Строит условие (k1, k2, ...) < (v1, v2, ...) или >."""
+        condition = Q()
+        for index, key in enumerate(self.keys):
+            step = Q(**{f'{key}__{lookup}': values[index]})
+            for prev_key, prev_value in zip(self.keys[:index], values):
+                step &= Q(**{prev_key: prev_value})
+            condition |= step
+        return condition
+
+    def _parse_values(self, raw_values):
+        if len(raw_values) != len(self.keys):
+            return None
+        model = self.object_list.model
+        try:
+            return [model._meta.get_field(key).to_python(value)
+                    for key, value in zip(self.keys, raw_values)]
+        except (ValidationError, TypeError, ValueError):
+            return None
+
+    def get_page(self, cursor=None):
+        """Возвращает страницу по токену; битый токен даёт первую."""
+        decoded = decode_cursor(cursor) if cursor else None
+        values = self._parse_values(decoded[1]) if decoded else None
+        if values is None:
+            rows = list(self.object_list[:self.per_page + 1])
+            return KeysetPage(rows[:self.per_page], self,
+                              has_next=len(rows) > self.per_page,
+                              has_previous=False)
+        direction = decoded[0]
+        if direction == 'next':
+            queryset = self.object_list.filter(
+                self._seek_filter(values, 'lt')
+            )
+            rows = list(queryset[:self.per_page + 1])
+            return KeysetPage(rows[:self.per_page], self,
+                              has_next=len(rows) > self.per_page,
+                              has_previous=True)
+        queryset = self.object_list.filter(
+            self._seek_filter(values, 'gt')
+        ).reverse()
+        rows = list(queryset[:self.per_page + 1])
+        return KeysetPage(rows[:self.per_page][::-1], self,
+                          has_next=True,
+                          has_previous=len(rows) > self.per_page)
+
+    def page(self, number):
+        return self.get_page(number)
+
+
+class FeedPage(Page):
+    @property
+    def page_window(self):
+        return self.paginator.page_window(self.number)
+
+
+class FeedPaginator(Paginator):
+    """
+    Пагинатор по номерам страниц, который вместо полного page_range
+    отдаёт окно: крайние страницы, соседи текущей и многоточия.
+    """
+    ELLIPSIS = '…'
+
+    def __init__(self, *args, on_each_side=2, on_ends=1, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.on_each_side = on_each_side
+        self.on_ends = on_ends
+
+    def _get_page(self, *args, **kwargs):
+        return FeedPage(*args, **kwargs)
+
+    def page_window(self, number):
+        num_pages = self.num_pages
+        on_each_side, on_ends = self.on_each_side, self.on_ends
+        if num_pages <= (on_each_side + on_ends) * 2 + 1:
+            return list(self.page_range)
+        window = []
+        if number > on_each_side + on_ends + 2:
+            window.extend(range(1, on_ends + 1))
+            window.append(self.ELLIPSIS)
+            window.extend(range(number - on_each_side, number + 1))
+        else:
+            window.extend(range(1, number + 1))
+        if number < num_pages - on_each_side - on_ends - 1:
+            window.extend(range(number + 1, number + on_each_side + 1))
+            window.append(self.ELLIPSIS)
+            window.extend(range(num_pages - on_ends + 1, num_pages + 1))
+        else:
+            window.extend(range(number + 1, num_pages + 1))
+        return window
+
+
+def planner_count(queryset):
+    """
+    Оценка числа строк без COUNT(*): план PostgreSQL или статистика
+    ANALYZE в SQLite (только для ленты без фильтров). None — оценки нет.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+    if connection.vendor == 'sqlite' and not queryset.query.where:
+        with connection.cursor() as cursor:
+            try:
+                cursor.execute(
+                    'SELECT stat FROM sqlite_stat1 WHERE tbl = %s',
+                    [queryset.model._meta.db_table]
+                )
+            except DatabaseError:
+                # ANALYZE ещё не запускали, таблицы статистики нет
+                return None
+            row = cursor.fetchone()
+        if row:
+            return int(row[0].split()[0])
+    return None
+
+
+def estimated_count(queryset):
+    """
+    Число объектов для полосы страниц: из кэша, иначе оценка планировщика,
+    иначе точный COUNT(*), который кэшируется на POSTS_COUNT_CACHE_TIMEOUT.
+    """
+    sql, params = queryset.query.sql_with_params()
+    key = 'posts:count:' + hashlib.md5(
+        f'{queryset.db}:{sql}:{params}'.encode()).hexdigest()
+    count = cache.get(key)
+    if count is None:
+        count = planner_count(queryset)
+        if count is None:
+            count = queryset.count()
+        cache.set(key, count, settings.POSTS_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+class EstimatedPaginator(Paginator):
+    """Пагинатор, берущий число объектов из estimated_count."""
+
+    @cached_property
+    def count(self):
+        return estimated_count(self.object_list)
 
 
-def paginating(request, post_list):
-    paginator = Paginator(post_list, COUNT)
+def paginating(request, post_list, count=None, keys=None):
+    """
+    Возвращает страницу ленты. Известное заранее число постов (count)
+    избавляет обычный пагинатор от запроса COUNT(*); в режиме
+    POSTS_COUNT_MODE = 'estimated' число берётся из estimated_count.
+    Обёртка над queryset (например, лента группы из кэша) отдаёт его
+    в атрибуте queryset для курсоров и оценки числа постов.
+    Лента с другими ключами сортировки (keys) листается только курсором.
+    """
+    cursor = request.GET.get('cursor')
+    keyset = getattr(settings, 'POSTS_PAGINATION', 'offset') == 'keyset'
+    queryset = post_list
+    if not isinstance(queryset, QuerySet):
+        queryset = getattr(post_list, 'queryset', None)
+    if (cursor is not None or keyset or keys) and queryset is not None:
+        return KeysetPaginator(queryset, COUNT,
+                               keys=keys or KEYSET_KEYS).get_page(cursor)
+    paginator = FeedPaginator(post_list, COUNT)
+    if count is not None:
+        paginator.count = count
+    elif queryset is not None and settings.POSTS_COUNT_MODE == 'estimated':
+        paginator.count = estimated_count(queryset)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return page_obj
@@ -1,57 +1,177 @@
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.http import JsonResponse
 from django.shortcuts import render
 from django.shortcuts import redirect
+from django.urls import reverse
 from .models import Post, Group
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
 from .forms import PostForm
 from django.contrib.auth.decorators import login_required
-from posts import utils
+from django.db.models import Q
+from core.db import use_primary
+from posts import caching, feeds, hits, search, timeline, utils
+from users.models import Profile
 
 User = get_user_model()
 
 
+def is_popular(request):
+    return request.GET.get('sort') == 'popular'
+
+
+def sort_context(popular):
+    """Режим ленты для шаблона; ссылки пагинатора его сохраняют."""
+    return {
+        'popular': popular,
+        'page_query': 'sort=popular&' if popular else '',
+    }
+
+
+@caching.conditional(lambda: (caching.INDEX_SCOPE,))
+@caching.guest_page(lambda: (caching.INDEX_SCOPE,))
 def index(request):
-    post_list = Post.objects.all().order_by('-pub_date')
-    page_obj = utils.paginating(request, post_list)
+    post_list = Post.objects.feed()
+    popular = is_popular(request)
+    page_obj = utils.paginating(
+        request, post_list, keys=utils.POPULAR_KEYS if popular else None)
     context = {
         'page_obj': page_obj,
+        **sort_context(popular),
+        **caching.feed_cache(request, caching.INDEX_SCOPE),
     }
     return render(request, 'posts/index.html', context)
 
 
+@caching.conditional(lambda slug: (caching.group_scope(slug),))
+@caching.guest_page(lambda slug: (caching.group_scope(slug),))
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = Post.objects.all().order_by('-pub_date')
-    page_obj = utils.paginating(request, post_list)
+    post_list = Post.objects.filter(group=group).feed()
+    popular = is_popular(request)
+    if popular:
+        page_obj = utils.paginating(request, post_list,
+                                    keys=utils.POPULAR_KEYS)
+    else:
+        if settings.POSTS_TIMELINE_SIZE:
+            post_list = timeline.GroupTimeline(group, post_list)
+        page_obj = utils.paginating(request, post_list,
+                                    count=group.posts_count)
     context = {
         'group': group,
         'page_obj': page_obj,
+        **sort_context(popular),
+        **caching.feed_cache(request, caching.group_scope(slug)),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@caching.conditional(lambda username: (caching.profile_scope(username),))
+@caching.guest_page(lambda username: (caching.profile_scope(username),))
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.select_related('group')
-    page_obj = utils.paginating(request, post_list)
+    author = get_object_or_404(
+        User.objects.select_related('profile'), username=username
+    )
+    try:
+        posts_count = author.profile.posts_count
+    except Profile.DoesNotExist:
+        # профиль ещё не создан, например после loaddata
+        posts_count = None
+    post_list = author.posts.feed()
+    page_obj = utils.paginating(request, post_list, count=posts_count)
     context = {
         'author': author,
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        **caching.feed_cache(request, caching.profile_scope(username)),
     }
     return render(request, 'posts/profile.html', context)
 
 
+@caching.conditional(lambda fmt: (caching.INDEX_SCOPE,), per_viewer=False)
+def index_feed(request, fmt):
+    return feeds.feed_response(
+        request, fmt, Post.objects.feed(),
+        title='Последние обновления на сайте',
+        link=reverse('posts:index'),
+        updated=caching.scope_modified(caching.INDEX_SCOPE),
+    )
+
+
+@caching.conditional(lambda fmt, slug: (caching.group_scope(slug),),
+                     per_viewer=False)
+def group_feed(request, fmt, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return feeds.feed_response(
+        request, fmt, Post.objects.filter(group=group).feed(),
+        title=group.title,
+        link=reverse('posts:groups', args=(slug,)),
+        updated=caching.scope_modified(caching.group_scope(slug)),
+    )
+
+
+@caching.conditional(lambda fmt, username: (caching.profile_scope(username),),
+                     per_viewer=False)
+def profile_feed(request, fmt, username):
+    author = get_object_or_404(User, username=username)
+    return feeds.feed_response(
+        request, fmt, author.posts.feed(),
+        title=f'Записи {author.get_full_name() or username}',
+        link=reverse('posts:profile', args=(username,)),
+        updated=caching.scope_modified(caching.profile_scope(username)),
+    )
+
+
+def search_posts(request):
+    query = request.GET.get('q', '').strip()
+    post_ids = search.search_ids(query) if query else []
+    page_obj = utils.paginating(request, post_ids)
+    posts = Post.objects.feed().in_bulk(page_obj.object_list)
+    page_obj.object_list = [
+        posts[pk] for pk in page_obj.object_list if pk in posts
+    ]
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@hits.counted
+@caching.conditional_post
+@caching.guest_page(caching.detail_scopes)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post.objects.select_related(), id=post_id)
+    post, detail_key = caching.cached_post(post_id)
     context = {
-        'post': post
+        'post': post,
+        'detail_key': detail_key,
+        'detail_timeout': settings.POSTS_DETAIL_CACHE_TIMEOUT,
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def group_lookup(request):
+    """Поиск групп для формы поста: JSON по страницам."""
+    query = request.GET.get('q', '').strip()
+    groups = Group.objects.order_by('title', 'pk')
+    if query:
+        groups = groups.filter(
+            Q(title__icontains=query) | Q(slug__icontains=query))
+    paginator = Paginator(groups.values('id', 'title'), utils.COUNT * 2)
+    page = paginator.get_page(request.GET.get('page'))
+    return JsonResponse({
+        'results': list(page.object_list),
+        'has_next': page.has_next(),
+    })
+
+
 @login_required
+@use_primary
 def post_create(request):
-    form = PostForm(request.POST)
+    form = PostForm(request.POST or None)
     context = {'form': form}
     if request.method == 'POST':
         if form.is_valid():
@@ -63,6 +183,7 @@ def post_create(request):
 
 
 @login_required
+@use_primary
 def post_edit(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = PostForm(request.POST or None, instance=post)
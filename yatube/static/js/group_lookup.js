@@ -0,0 +1,55 @@
+// Поиск группы для формы поста вместо длинного списка
+document.querySelectorAll('select[data-lookup-url]').forEach(function (select) {
+  var search = document.createElement('input');
+  search.type = 'search';
+  search.className = 'form-control mb-2';
+  search.placeholder = 'Найти группу';
+  select.parentNode.insertBefore(search, select);
+
+  var timer = null;
+  var page = 1;
+
+  function load(append) {
+    var url = select.dataset.lookupUrl + '?' + new URLSearchParams({
+      q: search.value, page: page
+    });
+    fetch(url).then(function (response) {
+      return response.json();
+    }).then(function (data) {
+      if (!append) {
+        Array.from(select.options).forEach(function (option) {
+          if (option.value && !option.selected) option.remove();
+        });
+      }
+      var more = select.querySelector('option[data-more]');
+      if (more) more.remove();
+      data.results.forEach(function (group) {
+        if (!select.querySelector('option[value="' + group.id + '"]')) {
+          select.add(new Option(group.title, group.id));
+        }
+      });
+      if (data.has_next) {
+        var option = new Option('Показать ещё…', '');
+        option.dataset.more = 'true';
+        select.add(option);
+      }
+    });
+  }
+
+  search.addEventListener('input', function () {
+    clearTimeout(timer);
+    timer = setTimeout(function () {
+      page = 1;
+      load(false);
+    }, 300);
+  });
+  select.addEventListener('change', function () {
+    var option = select.selectedOptions[0];
+    if (option && option.dataset.more) {
+      option.selected = false;
+      page += 1;
+      load(true);
+    }
+  });
+  load(false);
+});
@@ -35,9 +35,23 @@ ALLOWED_HOSTS = [
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 
+# Режим пагинации лент: 'offset' (номера страниц) или 'keyset' (курсоры)
+POSTS_PAGINATION = 'offset'
+# Число постов для полосы страниц: 'exact' (COUNT(*) на каждый запрос)
+# или 'estimated' (кэш и оценка планировщика)
+POSTS_COUNT_MODE = 'exact'
+POSTS_COUNT_CACHE_TIMEOUT = 60
 
-#  подключаем движок filebased.EmailBackend
-EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+
+# Отложенные задачи (core.tasks) пишутся в таблицу Task и выполняются
+# командой run_worker; YATUBE_TASKS_EAGER=1 выполняет их сразу в запросе
+TASKS_EAGER = os.environ.get('YATUBE_TASKS_EAGER') == '1'
+
+
+# письма ставятся в очередь и уходят командой send_queued_mail
+EMAIL_BACKEND = 'core.mail.QueuedEmailBackend'
+#  подключаем движок filebased.EmailBackend для отправки из очереди
+EMAIL_QUEUE_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 # указываем директорию, в которую будут складываться файлы писем
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
@@ -57,7 +71,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.timing.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.db.PrimaryPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -68,6 +84,11 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'yatube.urls'
 
+# Замеры запросов: заголовок Server-Timing, лог yatube.timing и
+# статистика по последним REQUEST_TIMING_WINDOW запросам на /admin/timing/
+REQUEST_TIMING_ENABLED = True
+REQUEST_TIMING_WINDOW = 1000
+
 
 # Путь к директории с шаблонами вынесен в переменную:
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
@@ -98,9 +119,104 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'NAME': os.environ.get('YATUBE_DB_NAME',
+                               os.path.join(BASE_DIR, 'db.sqlite3')),
+    }
+}
+
+# Реплики только для чтения: пути к файлам SQLite через запятую в
+# YATUBE_DB_REPLICAS; локально их наполняет команда sync_replicas
+DATABASE_REPLICAS = []
+for number, name in enumerate(
+        filter(None, os.environ.get('YATUBE_DB_REPLICAS', '').split(',')),
+        start=1):
+    DATABASES[f'replica_{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+        'TEST': {'MIRROR': 'default'},
     }
+    DATABASE_REPLICAS.append(f'replica_{number}')
+
+DATABASE_ROUTERS = ['core.db.PrimaryReplicaRouter']
+# Приложения, чьи модели читаются с реплик
+DATABASE_REPLICA_APPS = ('posts',)
+# Сколько секунд после записи клиент читает с основной базы
+DATABASE_PIN_SECONDS = 5
+
+# Профиль SQLite для продакшена (YATUBE_DB_PROFILE=production): WAL, чтобы
+# запись не блокировала чтение, ожидание блокировок вместо ошибки
+# «database is locked», mmap и кэш страниц побольше
+SQLITE_PRODUCTION_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
 }
+SQLITE_PRAGMAS = {}
+if os.environ.get('YATUBE_DB_PROFILE') == 'production':
+    SQLITE_PRAGMAS = SQLITE_PRODUCTION_PRAGMAS
+    for database in DATABASES.values():
+        # постоянные соединения: PRAGMA выполняются раз на соединение
+        database['CONN_MAX_AGE'] = 60
+
+
+# Cache
+# https://docs.djangoproject.com/en/2.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Время жизни кэша фрагментов лент, секунды
+POSTS_FEED_CACHE_TIMEOUT = 60 * 5
+# Время жизни кэша страницы поста, секунды
+POSTS_DETAIL_CACHE_TIMEOUT = 60 * 15
+
+# Сколько последних id постов группы держать в кэше для первых страниц
+# её ленты; 0 - читать ленту группы только из базы
+POSTS_TIMELINE_SIZE = 50
+
+# Сколько последних постов попадает в ленты RSS и Atom
+POSTS_FEED_ITEMS = 50
+
+# Кэш целых страниц лент и постов для гостей без cookie сессии
+POSTS_PAGE_CACHE = True
+POSTS_PAGE_CACHE_TIMEOUT = 60 * 5
+
+# При большем числе групп в форме поста вместо списка - поиск группы
+POSTS_GROUP_SELECT_LIMIT = 200
+
+# Просмотры постов копятся в памяти и пишутся в базу раз в столько
+# просмотров или секунд
+POSTS_VIEWS_FLUSH_HITS = 100
+POSTS_VIEWS_FLUSH_SECONDS = 10
+# Лента популярного (?sort=popular): столько секунд свежести стоит
+# десятикратный рост просмотров
+POSTS_POPULAR_DECAY = 60 * 60 * 12
+
+# Поиск по постам: 'auto' (FTS5, если есть), 'fts5' или 'python'
+POSTS_SEARCH_BACKEND = 'auto'
+# Сколько лучших совпадений отдаёт поиск
+POSTS_SEARCH_LIMIT = 1000
+
+
+# YATUBE_CACHED_SESSIONS=1: сессии в кэше с записью в базу, пользователь
+# сессии тоже из кэша, запрос вошедшего пользователя обходится без двух
+# запросов к базе. Нужен общий для процессов кэш вместо LocMemCache,
+# иначе выход и смена пароля сбросят кэш только в одном процессе
+# (это проверяет core.E001)
+if os.environ.get('YATUBE_CACHED_SESSIONS') == '1':
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+    AUTHENTICATION_BACKENDS = [
+        'core.auth.CachedModelBackend',
+        # сессии, начатые до включения кэша
+        'django.contrib.auth.backends.ModelBackend',
+    ]
+AUTH_USER_CACHE_TIMEOUT = 60
 
 
 # Password validation